@@ -1,10 +1,54 @@
-from supabase import create_client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+import httpx
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-supabase = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_KEY")
-) 
\ No newline at end of file
+# Shared PostgREST connection pool, sized per worker process
+POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("SUPABASE_POOL_SIZE", "50")),
+    max_keepalive_connections=int(os.getenv("SUPABASE_POOL_SIZE", "50")),
+    keepalive_expiry=30.0
+)
+
+TIMEOUTS = httpx.Timeout(
+    connect=10.0,
+    read=60.0,
+    write=60.0,
+    pool=10.0
+)
+
+_http_client: httpx.AsyncClient | None = None
+_supabase: AsyncClient | None = None
+
+async def connect() -> AsyncClient:
+    """Create the async Supabase client and its connection pool (called from the app lifespan)"""
+    global _http_client, _supabase
+    if _supabase is None:
+        _http_client = httpx.AsyncClient(
+            limits=POOL_LIMITS,
+            timeout=TIMEOUTS,
+            http2=True,
+            follow_redirects=True
+        )
+        _supabase = await acreate_client(
+            os.getenv("SUPABASE_URL"),
+            os.getenv("SUPABASE_KEY"),
+            options=AsyncClientOptions(httpx_client=_http_client)
+        )
+    return _supabase
+
+async def disconnect():
+    """Close the shared connection pool"""
+    global _http_client, _supabase
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _supabase = None
+
+def get_supabase() -> AsyncClient:
+    """Get the shared async Supabase client"""
+    if _supabase is None:
+        raise RuntimeError("Supabase client is not connected, the app lifespan has not started")
+    return _supabase
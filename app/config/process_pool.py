@@ -0,0 +1,58 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator
+import multiprocessing
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# processes for CPU bound batches (signature recovery, HD derivation), per worker process
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(os.cpu_count() or 1)))
+
+_executor: ProcessPoolExecutor | None = None
+
+def connect() -> ProcessPoolExecutor:
+    """Create the shared process pool (called from the app lifespan)"""
+    global _executor
+    if _executor is None:
+        # spawned, not forked: the API process runs threads whose held locks a fork would copy.
+        # Paid once per worker process, the processes are reused by every batch
+        _executor = ProcessPoolExecutor(
+            max_workers=PROCESS_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+def disconnect():
+    """Shut the shared process pool down, cancelling batches that have not started"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+    _executor = None
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    """The shared process pool, or None outside the app lifespan (scripts, benchmarks)"""
+    return _executor
+
+def map_in_pool(fn: Callable, chunks: Iterable[tuple], workers: int) -> Iterator:
+    """Yield fn(*chunk) for each chunk, in order. Up to `workers` chunks run at a time in the
+    shared pool, without a pool or with `workers` <= 1 they run in the calling thread"""
+    executor = get_process_pool()
+    if executor is None or not workers or workers <= 1:
+        for chunk in chunks:
+            yield fn(*chunk)
+        return
+
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(fn, *chunk))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # an abandoned generator does not leave its chunks queued in the shared pool
+        for future in pending:
+            future.cancel()
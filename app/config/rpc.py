@@ -0,0 +1,147 @@
+from web3 import Web3, AsyncWeb3
+import aiohttp
+import asyncio
+import requests
+import os
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from app.utils.guard import UpstreamGuard, is_upstream_failure
+
+load_dotenv()
+
+# keep-alive connections per chain and per worker process
+POOL_SIZE = int(os.getenv("WEB3_POOL_SIZE", "20"))
+REQUEST_TIMEOUT = float(os.getenv("WEB3_TIMEOUT", "30"))
+# requests per second to each chain's node across all workers of the host
+RATE_LIMIT = float(os.getenv("WEB3_RATE_LIMIT", "25"))
+RATE_BURST = float(os.getenv("WEB3_RATE_BURST", "50"))
+
+_providers: dict[int, Web3] = {}
+_async_providers: dict[int, AsyncWeb3] = {}
+_sessions: list[requests.Session] = []
+
+def _is_failure(e: Exception) -> bool:
+    # client errors come from the request itself, only outages and throttling trip the breaker
+    status = getattr(e, "status", None) or getattr(getattr(e, "response", None), "status_code", None)
+    return status is None or is_upstream_failure(status)
+
+class GuardedHTTPProvider(Web3.HTTPProvider):
+    """HTTPProvider whose requests go through the chain's UpstreamGuard"""
+
+    def __init__(self, guard: UpstreamGuard, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.guard = guard
+
+    def make_request(self, method, params):
+        self.guard.acquire_sync()
+        try:
+            response = super().make_request(method, params)
+        except Exception as e:
+            self.guard.record(not _is_failure(e))
+            raise
+        self.guard.record(True)
+        return response
+
+    def make_batch_request(self, batch_requests):
+        self.guard.acquire_sync()
+        try:
+            response = super().make_batch_request(batch_requests)
+        except Exception as e:
+            self.guard.record(not _is_failure(e))
+            raise
+        self.guard.record(True)
+        return response
+
+class GuardedAsyncHTTPProvider(AsyncWeb3.AsyncHTTPProvider):
+    """AsyncHTTPProvider whose requests go through the chain's UpstreamGuard"""
+
+    def __init__(self, guard: UpstreamGuard, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.guard = guard
+
+    async def make_request(self, method, params):
+        await self.guard.acquire()
+        try:
+            response = await super().make_request(method, params)
+        except Exception as e:
+            await self.guard.report(not _is_failure(e))
+            raise
+        await self.guard.report(True)
+        return response
+
+    async def make_batch_request(self, batch_requests):
+        await self.guard.acquire()
+        try:
+            response = await super().make_batch_request(batch_requests)
+        except Exception as e:
+            await self.guard.report(not _is_failure(e))
+            raise
+        await self.guard.report(True)
+        return response
+
+def get_configured_chains() -> dict[int, str]:
+    """Chain ids with a WEB3_URL_{chain_id} entry in the environment"""
+    return {
+        int(key.removeprefix("WEB3_URL_")): url
+        for key, url in os.environ.items()
+        if key.startswith("WEB3_URL_") and key.removeprefix("WEB3_URL_").isdigit() and url
+    }
+
+async def connect(warm_up: bool = False):
+    """Build the per-chain providers (called from the app lifespan)"""
+    for chain_id, url in get_configured_chains().items():
+        session = requests.Session()
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        _sessions.append(session)
+        guard = UpstreamGuard(f"rpc-{chain_id}", rate=RATE_LIMIT, burst=RATE_BURST)
+        _providers[chain_id] = Web3(GuardedHTTPProvider(
+            guard,
+            url,
+            request_kwargs={"timeout": REQUEST_TIMEOUT},
+            session=session
+        ))
+
+        provider = GuardedAsyncHTTPProvider(
+            guard,
+            url,
+            request_kwargs={"timeout": aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)}
+        )
+        # web3's default session closes the connection after every request
+        await provider.cache_async_session(aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            raise_for_status=True
+        ))
+        _async_providers[chain_id] = AsyncWeb3(provider)
+
+    if warm_up:
+        await asyncio.gather(*[_warm_up(chain_id, w3) for chain_id, w3 in _async_providers.items()])
+
+async def _warm_up(chain_id: int, w3: AsyncWeb3):
+    # opens the first pooled connection so the first request skips the handshake
+    try:
+        await w3.eth.chain_id
+    except Exception as e:
+        print(f"warm up failed for chain {chain_id}: {str(e)}")
+
+async def disconnect():
+    for w3 in _async_providers.values():
+        await w3.provider.disconnect()
+    for session in _sessions:
+        session.close()
+    _sessions.clear()
+    _providers.clear()
+    _async_providers.clear()
+
+def get_web3(chain_id: int) -> Web3:
+    """Pooled synchronous Web3 for a chain"""
+    if chain_id not in _providers:
+        raise ValueError(f"No web3 URL configured for chain ID {chain_id}")
+    return _providers[chain_id]
+
+def get_async_web3(chain_id: int) -> AsyncWeb3:
+    """Pooled AsyncWeb3 for a chain"""
+    if chain_id not in _async_providers:
+        raise ValueError(f"No web3 URL configured for chain ID {chain_id}")
+    return _async_providers[chain_id]
@@ -15,4 +15,13 @@ class Chain(IntEnum):
         elif chain_id == Chain.AvalancheMainnet:
             return "Avalanche Mainnet"
         else:
-            return "Unknown Network" 
\ No newline at end of file
+            return "Unknown Network"
+
+    @staticmethod
+    def get_stakekit_network(chain_id: int) -> str | None:
+        if chain_id == Chain.EthereumMainnet:
+            return "ethereum"
+        elif chain_id == Chain.AvalancheMainnet:
+            return "avalanche-c"
+        else:
+            return None
\ No newline at end of file
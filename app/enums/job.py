@@ -0,0 +1,14 @@
+from enum import StrEnum
+
+class JobType(StrEnum):
+    EXECUTE = "execute"
+    STAKE = "stake"
+    UNSTAKE = "unstake"
+    WITHDRAW = "withdraw"
+
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUBMITTED = "submitted"
+    CONFIRMED = "confirmed"
+    FAILED = "failed"
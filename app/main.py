@@ -1,13 +1,49 @@
+from contextlib import asynccontextmanager
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import database
+from app.config import rpc
+from app.config import process_pool
 from app.routes import legacy
 from app.routes import contract
 from app.routes import protocol
+from app.routes import wallet
+from app.routes import job
+from app.services.job import JobService
+from app.services.watcher import TransactionWatcher
+from app.services.stakekit import StakeKitService
+from app.services.balance import BalanceService
+from app.services.investment_wallet import InvestmentWalletService
+from app.utils.identity_map import IdentityMapMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # shared resources live for the whole worker process
+    await database.connect()
+    await rpc.connect(warm_up=os.getenv("WEB3_WARM_UP", "false").lower() == "true")
+    await StakeKitService.connect()
+    process_pool.connect()
+    # queue workers, balance refresh and wallet pool filler, off for benchmarks and one-off scripts
+    if os.getenv("BACKGROUND_TASKS", "true").lower() == "true":
+        await JobService.start()
+        BalanceService.start()
+        InvestmentWalletService.start()
+    yield
+    await InvestmentWalletService.stop()
+    await BalanceService.stop()
+    await JobService.stop()
+    await TransactionWatcher.stop()
+    await StakeKitService.close()
+    process_pool.disconnect()
+    await rpc.disconnect()
+    await database.disconnect()
 
 app = FastAPI(
     title="Aevia API",
     description="API to manage legacies",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -19,6 +55,9 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# rows loaded while handling a request are shared by every service it calls
+app.add_middleware(IdentityMapMiddleware)
+
 @app.get("/")
 def read_root():
     return {"status": "running"}
@@ -26,4 +65,6 @@ def read_root():
 # include routes
 app.include_router(legacy.router) 
 app.include_router(contract.router) 
-app.include_router(protocol.router) 
\ No newline at end of file
+app.include_router(protocol.router)
+app.include_router(wallet.router)
+app.include_router(job.router) 
\ No newline at end of file
@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import Any
+from app.enums.job import JobType, JobStatus
+
+class Job(BaseModel):
+    id: str | None = None
+    legacy_id: str
+    type: JobType
+    status: JobStatus
+    chain_id: int | None = None
+    tx_hash: str | None = None
+    idempotency_key: str | None = None
+    result: Any = None
+    error: str | None = None
+    checkpoint: dict[str, Any] | None = None
+    attempts: int | None = None
+    locked_by: str | None = None
+    locked_at: str | None = None
+    created_at: str | None = None
+    updated_at: str | None = None
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+import uuid
 from app.enums.token_type import TokenType
 from app.enums.investment_risk import InvestmentRisk
 
@@ -23,4 +24,10 @@ class Legacy(BaseModel):
     signal_received_at: str | None = None
     investment_enabled: bool | None = None
     investment_risk: InvestmentRisk | None = None
-    investment_wallet: str | None = None
\ No newline at end of file
+    investment_wallet: str | None = None
+    execution_tx_hash: str | None = None
+    executed_at: str | None = None
+
+class LegacySignatureBatch(BaseModel):
+    ids: list[uuid.UUID]
+    include_digest: bool = False
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field, model_validator
+import os
+
+# indexes one request may derive, larger ranges are sent as several requests
+MAX_INDEX_COUNT = 100000
+
+class WalletAddressRange(BaseModel):
+    start: int = Field(0, ge=0, lt=2**31)
+    count: int = Field(gt=0, le=MAX_INDEX_COUNT)
+    # derivation processes, never more than the host has CPUs
+    workers: int | None = Field(None, gt=0, le=os.cpu_count() or 1)
+
+    @model_validator(mode="after")
+    def check_end(self):
+        # indexes from 2^31 are hardened and cannot be derived from the public parent
+        if self.start + self.count > 2**31:
+            raise ValueError("start + count must not exceed 2^31")
+        return self
+
+class TokenBalanceItem(BaseModel):
+    address: str
+    token_address: str
+
+class TokenBalancesRequest(BaseModel):
+    chain_id: int
+    items: list[TokenBalanceItem]
@@ -0,0 +1,32 @@
+from postgrest.types import ReturnMethod
+from app.config.database import get_supabase
+from app.utils.pagination import after_filter
+
+# keyset of the snapshot listing order
+LIST_KEYS = ("legacy_id",)
+
+class BalanceSnapshotRepository:
+    """Async data access for the balance_snapshots table"""
+
+    @staticmethod
+    async def get_many(legacy_ids: list[str]) -> list[dict]:
+        result = await get_supabase().table("balance_snapshots").select("*").in_("legacy_id", legacy_ids).execute()
+        return result.data
+
+    @staticmethod
+    async def list_page(after: list | None, limit: int) -> list[dict]:
+        """Up to `limit` snapshots after the `after` keyset values, in LIST_KEYS order"""
+        query = get_supabase().table("balance_snapshots").select("*")
+        if after:
+            query = query.or_(after_filter(LIST_KEYS, after))
+        result = await query.order(LIST_KEYS[0]).limit(limit).execute()
+        return result.data
+
+    @staticmethod
+    async def get_last_refreshed_at() -> str | None:
+        result = await get_supabase().table("balance_snapshots").select("refreshed_at").order("refreshed_at", desc=True).limit(1).execute()
+        return result.data[0]["refreshed_at"] if result.data else None
+
+    @staticmethod
+    async def upsert_many(rows: list[dict]):
+        await get_supabase().table("balance_snapshots").upsert(rows, on_conflict="legacy_id", returning=ReturnMethod.minimal).execute()
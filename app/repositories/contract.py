@@ -0,0 +1,38 @@
+from app.config.database import get_supabase
+from app.utils.pagination import after_filter
+
+# columns of the Contract model, and the list mode without the ABI
+COLUMNS = ("chain_id", "address", "name", "abi")
+LIGHT_COLUMNS = ("chain_id", "address", "name")
+# keyset of the listing order, id tells apart versions of a contract registered under one name
+LIST_KEYS = ("chain_id", "name", "id")
+
+class ContractRepository:
+    """Async data access for the contracts table"""
+
+    @staticmethod
+    async def get_all(columns: str = "*") -> list[dict]:
+        result = await get_supabase().table("contracts").select(columns).execute()
+        return result.data
+
+    @staticmethod
+    async def list_page(after: list | None, limit: int, columns: str = "*") -> list[dict]:
+        """Up to `limit` contracts after the `after` keyset values, in LIST_KEYS order"""
+        query = get_supabase().table("contracts").select(columns)
+        if after:
+            query = query.or_(after_filter(LIST_KEYS, after))
+        for key in LIST_KEYS:
+            query = query.order(key)
+        result = await query.limit(limit).execute()
+        return result.data
+
+    @staticmethod
+    async def get_by_chain_and_name(name: str, chain_id: int) -> dict | None:
+        """Latest registration of `name` on `chain_id`"""
+        result = await get_supabase().table("contracts").select(",".join(COLUMNS)).eq("chain_id", chain_id).eq("name", name).order("created_at", desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def insert(data: dict) -> dict:
+        result = await get_supabase().table("contracts").insert(data).execute()
+        return result.data[0]
@@ -0,0 +1,43 @@
+from app.config.database import get_supabase
+import uuid
+
+# columns of the InvestmentWallet model
+COLUMNS = "id,index,legacy_id,address,created_at,unstaked_at"
+
+class InvestmentWalletRepository:
+    """Async data access for the investment_wallets table"""
+
+    @staticmethod
+    async def insert(data: dict) -> dict:
+        result = await get_supabase().table("investment_wallets").insert(data).execute()
+        return result.data[0]
+
+    @staticmethod
+    async def insert_many(rows: list[dict]) -> list[dict]:
+        result = await get_supabase().table("investment_wallets").insert(rows).execute()
+        return result.data
+
+    @staticmethod
+    async def claim_many(legacy_ids: list[str]) -> list[dict]:
+        result = await get_supabase().rpc("claim_investment_wallets", {"p_legacy_ids": legacy_ids}).execute()
+        return result.data
+
+    @staticmethod
+    async def get_by_legacy_id(legacy_id: uuid.UUID) -> dict | None:
+        result = await get_supabase().table("investment_wallets").select(COLUMNS).eq("legacy_id", legacy_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_by_legacy_ids(legacy_ids: list[str], columns: str = COLUMNS) -> list[dict]:
+        result = await get_supabase().table("investment_wallets").select(columns).in_("legacy_id", legacy_ids).execute()
+        return result.data
+
+    @staticmethod
+    async def update_by_legacy_id(legacy_id: uuid.UUID, data: dict) -> dict | None:
+        result = await get_supabase().table("investment_wallets").update(data).eq("legacy_id", legacy_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_by_index(index: int) -> dict | None:
+        result = await get_supabase().table("investment_wallets").select(COLUMNS).eq("index", index).execute()
+        return result.data[0] if result.data else None
@@ -0,0 +1,49 @@
+from app.config.database import get_supabase
+import uuid
+
+class JobRepository:
+    """Async data access for the jobs table"""
+
+    @staticmethod
+    async def insert(data: dict) -> dict:
+        result = await get_supabase().table("jobs").insert(data).execute()
+        return result.data[0]
+
+    @staticmethod
+    async def get_by_id(job_id: uuid.UUID) -> dict | None:
+        result = await get_supabase().table("jobs").select("*").eq("id", job_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_by_status(job_type: str, status: str) -> list[dict]:
+        result = await get_supabase().table("jobs").select("*").eq("type", job_type).eq("status", status).execute()
+        return result.data
+
+    @staticmethod
+    async def get_by_idempotency_key(legacy_id: uuid.UUID, idempotency_key: str) -> dict | None:
+        result = await get_supabase().table("jobs").select("*").eq("legacy_id", legacy_id).eq("idempotency_key", idempotency_key).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_active_by_legacy(legacy_id: uuid.UUID) -> dict | None:
+        result = await get_supabase().table("jobs").select("*").eq("legacy_id", legacy_id).in_("status", ["queued", "running", "submitted"]).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_stale(job_type: str, status: str, locked_before: str) -> list[dict]:
+        result = await get_supabase().table("jobs").select("*").eq("type", job_type).eq("status", status).lt("locked_at", locked_before).execute()
+        return result.data
+
+    @staticmethod
+    async def update(job_id: uuid.UUID, data: dict) -> dict | None:
+        result = await get_supabase().table("jobs").update(data).eq("id", job_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def claim(worker: str, job_types: list[str], lease_seconds: int) -> dict | None:
+        result = await get_supabase().rpc("claim_job", {
+            "p_worker": worker,
+            "p_types": job_types,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        return result.data[0] if result.data else None
@@ -0,0 +1,107 @@
+from app.config.database import get_supabase
+from app.utils.pagination import after_filter
+from app.repositories.investment_wallet import COLUMNS as INVESTMENT_WALLET_COLUMNS
+import uuid
+
+# columns of the Legacy model
+COLUMNS = ",".join((
+    "id", "blockchain_id", "chain_id", "token_type", "token_address", "token_id", "amount",
+    "wallet", "heir_wallet", "signature", "name", "telegram_id", "telegram_id_emergency",
+    "telegram_id_heir", "contract_address", "signal_confirmation_retries", "signal_requested_at",
+    "signal_received_at", "investment_enabled", "investment_risk", "execution_tx_hash", "executed_at"
+))
+# columns of the EIP-712 Legacy message and its signature
+SIGNATURE_COLUMNS = ",".join((
+    "id", "blockchain_id", "chain_id", "token_type", "token_address", "token_id", "amount",
+    "wallet", "heir_wallet", "contract_address", "signature"
+))
+
+# columns a balance refresh needs to pick the StakeKit integration
+BALANCE_COLUMNS = "id,chain_id,token_address"
+# keyset of the listing order
+LIST_KEYS = ("created_at", "id")
+
+class LegacyRepository:
+    """Async data access for the legacies table"""
+
+    @staticmethod
+    async def insert(data: dict) -> dict:
+        result = await get_supabase().table("legacies").insert(data).execute()
+        return result.data[0]
+
+    @staticmethod
+    async def insert_many(rows: list[dict]) -> list[dict]:
+        result = await get_supabase().table("legacies").insert(rows).execute()
+        return result.data
+
+    @staticmethod
+    async def get_many(legacy_ids: list[str], columns: str = COLUMNS) -> list[dict]:
+        result = await get_supabase().table("legacies").select(columns).in_("id", legacy_ids).execute()
+        return result.data
+
+    @staticmethod
+    async def get_by_id(legacy_id: uuid.UUID, columns: str = COLUMNS) -> dict | None:
+        result = await get_supabase().table("legacies").select(columns).eq("id", legacy_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_with_investment_wallet(legacy_id: uuid.UUID) -> dict | None:
+        """The legacy row with its investment wallet row (or None) under "investment_wallets", in one query"""
+        result = await get_supabase().table("legacies").select(f"{COLUMNS}, investment_wallets({INVESTMENT_WALLET_COLUMNS})").eq("id", legacy_id).execute()
+        if not result.data:
+            return None
+        row = result.data[0]
+        # embedded as an object for a one-to-one relation, as a list otherwise
+        wallets = row.get("investment_wallets")
+        if isinstance(wallets, list):
+            row["investment_wallets"] = wallets[0] if wallets else None
+        return row
+
+    @staticmethod
+    async def get_last_by_user(user: str) -> dict | None:
+        result = await get_supabase().table("legacies").select(COLUMNS).eq("telegram_id", user).order("created_at", desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def update(legacy_id: uuid.UUID, data: dict) -> dict | None:
+        result = await get_supabase().table("legacies").update(data).eq("id", legacy_id).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def get_investment_enabled(legacy_ids: list[str], columns: str = COLUMNS) -> list[dict]:
+        result = await get_supabase().table("legacies").select(columns).eq("investment_enabled", True).in_("id", legacy_ids).execute()
+        return result.data
+
+    @staticmethod
+    async def get_signed(legacy_ids: list[str], columns: str = SIGNATURE_COLUMNS) -> list[dict]:
+        result = await get_supabase().table("legacies").select(columns).not_.is_("signature", "null").in_("id", legacy_ids).execute()
+        return result.data
+
+    @staticmethod
+    def keyset_page(query, after: list | None, limit: int):
+        """Restrict `query` to the `limit` rows after the `after` keyset values, in LIST_KEYS order"""
+        if after:
+            query = query.or_(after_filter(LIST_KEYS, after))
+        for key in LIST_KEYS:
+            query = query.order(key)
+        return query.limit(limit)
+
+    @staticmethod
+    def keyset_columns(columns: str) -> str:
+        return ",".join(dict.fromkeys(columns.split(",") + list(LIST_KEYS)))
+
+    @staticmethod
+    async def list_page(filters: dict, after: list | None, limit: int, columns: str = COLUMNS) -> list[dict]:
+        """Up to `limit` legacies matching `filters` after the `after` keyset values, in LIST_KEYS order"""
+        query = get_supabase().table("legacies").select(LegacyRepository.keyset_columns(columns))
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        result = await LegacyRepository.keyset_page(query, after, limit).execute()
+        return result.data
+
+    @staticmethod
+    async def get_signed_page(after: list | None, limit: int, columns: str = SIGNATURE_COLUMNS) -> list[dict]:
+        """list_page of the legacies with a stored signature"""
+        query = get_supabase().table("legacies").select(LegacyRepository.keyset_columns(columns)).not_.is_("signature", "null")
+        result = await LegacyRepository.keyset_page(query, after, limit).execute()
+        return result.data
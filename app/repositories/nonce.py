@@ -0,0 +1,23 @@
+from app.config.database import get_supabase
+
+class NonceRepository:
+    """Async access to the operator_nonces allocator functions"""
+
+    @staticmethod
+    async def allocate(chain_id: int, address: str, pending: int | None, lease_seconds: int) -> int | None:
+        result = await get_supabase().rpc("allocate_nonce", {
+            "p_chain_id": chain_id,
+            "p_address": address,
+            "p_pending": pending,
+            "p_lease_seconds": lease_seconds
+        }).execute()
+        return result.data
+
+    @staticmethod
+    async def release(chain_id: int, address: str, nonce: int, failed: bool):
+        await get_supabase().rpc("release_nonce", {
+            "p_chain_id": chain_id,
+            "p_address": address,
+            "p_nonce": nonce,
+            "p_failed": failed
+        }).execute()
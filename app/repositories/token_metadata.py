@@ -0,0 +1,14 @@
+from postgrest.types import ReturnMethod
+from app.config.database import get_supabase
+
+class TokenMetadataRepository:
+    """Async data access for the token_metadata table"""
+
+    @staticmethod
+    async def get_many(chain_id: int, token_addresses: list[str]) -> list[dict]:
+        result = await get_supabase().table("token_metadata").select("*").eq("chain_id", chain_id).in_("token_address", token_addresses).execute()
+        return result.data
+
+    @staticmethod
+    async def upsert_many(rows: list[dict]):
+        await get_supabase().table("token_metadata").upsert(rows, on_conflict="chain_id,token_address", returning=ReturnMethod.minimal).execute()
@@ -0,0 +1,33 @@
+from postgrest.types import CountMethod, ReturnMethod
+from app.config.database import get_supabase
+
+class WalletAddressRepository:
+    """Async data access for the wallet_addresses table (derived address -> HD index)"""
+
+    @staticmethod
+    async def upsert_many(rows: list[dict]):
+        await get_supabase().table("wallet_addresses").upsert(rows, on_conflict="index", returning=ReturnMethod.minimal).execute()
+
+    @staticmethod
+    async def get_by_address(address: str) -> dict | None:
+        result = await get_supabase().table("wallet_addresses").select("*").eq("address", address).execute()
+        return result.data[0] if result.data else None
+
+    @staticmethod
+    async def count_available() -> int:
+        result = await get_supabase().table("wallet_addresses").select("index", count=CountMethod.exact).eq("available", True).limit(1).execute()
+        return result.count or 0
+
+    @staticmethod
+    async def reserve_indexes(count: int) -> list[int]:
+        result = await get_supabase().rpc("reserve_wallet_indexes", {"p_count": count}).execute()
+        return result.data
+
+    @staticmethod
+    async def lock_pool_fill(worker: str, lease_seconds: int) -> bool:
+        result = await get_supabase().rpc("lock_wallet_pool_fill", {"p_worker": worker, "p_lease_seconds": lease_seconds}).execute()
+        return bool(result.data)
+
+    @staticmethod
+    async def unlock_pool_fill(worker: str):
+        await get_supabase().rpc("unlock_wallet_pool_fill", {"p_worker": worker}).execute()
@@ -1,6 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
 from app.models.contract import Contract
 from app.services.contract import ContractService
+from app.utils.pagination import ndjson
 
 router = APIRouter(
     prefix="/contracts",
@@ -8,8 +10,25 @@ router = APIRouter(
 )
 
 @router.get("", status_code=200)
-async def get_contracts():
-    return await ContractService.get_contracts()
+async def get_contracts(
+    fields: str | None = None,
+    light: bool = False,
+    cursor: str | None = None,
+    limit: int | None = Query(None, ge=1, le=500)
+):
+    # a page object when paginating, the plain list otherwise
+    if cursor or limit:
+        return await ContractService.list_contracts(fields.split(",") if fields else None, light, cursor, limit or 50)
+    return await ContractService.get_contracts(fields.split(",") if fields else None, light)
+
+@router.get("/export", status_code=200)
+async def export_contracts(fields: str | None = None, light: bool = False):
+    rows = ContractService.export_contracts(fields.split(",") if fields else None, light)
+    return StreamingResponse(ndjson(rows), media_type="application/x-ndjson")
+
+@router.get("/cache", status_code=200)
+async def get_contract_cache_stats():
+    return ContractService.get_cache_stats()
 
 @router.get("/{name}/{chain_id}", status_code=200)
 async def get_contract_by_chain_and_name(name: str, chain_id: int):
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from app.services.job import JobService
+import uuid
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"]
+)
+
+@router.get("/{id}", status_code=200)
+async def get_job(id: uuid.UUID):
+    return await JobService.get_job(id)
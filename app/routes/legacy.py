@@ -1,39 +1,72 @@
-from fastapi import APIRouter, Body
-from app.models.legacy import Legacy
+from fastapi import APIRouter, Body, Header, Query
+from fastapi.responses import StreamingResponse
+from app.models.legacy import Legacy, LegacySignatureBatch
 from app.services.legacy import LegacyService
+from app.services.balance import BalanceService
+from app.utils.pagination import ndjson
 import uuid
 router = APIRouter(
     prefix="/legacies",
     tags=["legacies"]
 )
 
+@router.get("", status_code=200)
+async def list_legacies(
+    user: str | None = None,
+    chain_id: int | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    return await LegacyService.list_legacies(user, chain_id, cursor, limit)
+
+@router.get("/export", status_code=200)
+async def export_legacies(user: str | None = None, chain_id: int | None = None):
+    rows = LegacyService.export_legacies(user, chain_id)
+    return StreamingResponse(ndjson(rows), media_type="application/x-ndjson")
+
 @router.get("/last/{user}", status_code=200)
 async def get_last_by_user(user: str):
     return await LegacyService.get_last_by_user(user)
 
+@router.get("/balances", status_code=200)
+async def get_balances(ids: list[uuid.UUID] | None = Query(None), refresh: bool = False):
+    return await BalanceService.get_balances([str(id) for id in ids] if ids else None, refresh)
+
 @router.post("", status_code=200)
 async def create_legacy(legacy: Legacy):
     return await LegacyService.create_legacy(legacy) 
 
+@router.post("/batch", status_code=200)
+async def create_legacies(legacies: list[Legacy]):
+    return await LegacyService.create_legacies(legacies)
+
+@router.post("/sign", status_code=200)
+async def get_signature_messages(batch: LegacySignatureBatch):
+    return await LegacyService.get_signature_messages([str(id) for id in batch.ids], batch.include_digest)
+
+@router.post("/signatures/verify", status_code=200)
+async def verify_signatures(ids: list[uuid.UUID] | None = Body(None, embed=True)):
+    return await LegacyService.verify_signatures([str(id) for id in ids] if ids else None)
+
 @router.post("/{id}/sign", status_code=200)
-async def get_signature_message(id: uuid.UUID):
-    return await LegacyService.get_signature_message(id)
+async def get_signature_message(id: uuid.UUID, include_digest: bool = False):
+    return await LegacyService.get_signature_message(id, include_digest)
 
 @router.patch("/{id}/sign", status_code=200)
 async def set_signature_for_legacy(id: uuid.UUID, body: dict = Body(...)):
     return await LegacyService.set_signature(id, body["signature"]) 
 
-@router.post("/{id}/execute", status_code=200)
-async def execute_legacy(id: uuid.UUID):
-    return await LegacyService.execute_legacy(id)
+@router.post("/{id}/execute", status_code=202)
+async def execute_legacy(id: uuid.UUID, idempotency_key: str | None = Header(None)):
+    return await LegacyService.execute_legacy(id, idempotency_key)
 
-@router.post("/{id}/stake", status_code=200)
-async def stake_legacy(id: uuid.UUID):
-    return await LegacyService.stake(id)
+@router.post("/{id}/stake", status_code=202)
+async def stake_legacy(id: uuid.UUID, idempotency_key: str | None = Header(None)):
+    return await LegacyService.stake(id, idempotency_key)
 
-@router.post("/{id}/withdraw", status_code=200)
-async def withdraw_legacy(id: uuid.UUID):
-    return await LegacyService.withdraw(id)
+@router.post("/{id}/withdraw", status_code=202)
+async def withdraw_legacy(id: uuid.UUID, idempotency_key: str | None = Header(None)):
+    return await LegacyService.withdraw(id, idempotency_key)
 
 @router.get("/{id}/balance", status_code=200)
 async def get_balance(id: uuid.UUID):
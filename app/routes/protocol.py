@@ -3,9 +3,17 @@ from pydantic import BaseModel
 import httpx
 import os
 from dotenv import load_dotenv
+from app.utils.guard import UpstreamGuard, UpstreamUnavailable, GuardedTransport
 
 load_dotenv()
 
+# requests per second to the agent API across all workers of the host
+AGENT_GUARD = UpstreamGuard(
+    "agent",
+    rate=float(os.getenv("AGENT_RATE_LIMIT", "5")),
+    burst=float(os.getenv("AGENT_RATE_BURST", "10"))
+)
+
 router = APIRouter(
     prefix="/protocol",
     tags=["protocol"]
@@ -22,6 +30,8 @@ async def start_cron(request: ProtocolRequest):
     try:
         await call_agent_api("user", request.user, request.beneficiary, request.legacy, request.contact_id)
         return {"status": "success", "message": "Cron started successfully"}
+    except UpstreamUnavailable as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -41,6 +51,8 @@ async def handle_emergency_protocol(request: ProtocolRequest):
     try:
         await call_agent_api("emergency", request.user, request.beneficiary, request.legacy, request.contact_id)
         return {"status": "success", "message": "Emergency protocol initiated"}
+    except UpstreamUnavailable as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -53,11 +65,13 @@ async def handle_dead_protocol(request: ProtocolRequest):
             "message": f"Dead protocol executed for user {request.user}",
             "protocol": "dead"
         }
+    except UpstreamUnavailable as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def call_agent_api(status_agent: str, user: str, beneficiary: str, legacy: str, contact_id: str):
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(transport=GuardedTransport(AGENT_GUARD)) as client:
         data = {
             "user": user,
             "beneficiary": beneficiary,
@@ -74,6 +88,8 @@ async def call_agent_api(status_agent: str, user: str, beneficiary: str, legacy:
             )
             response.raise_for_status()
             return response.json()
+        except UpstreamUnavailable as e:
+            raise e
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=500,
@@ -0,0 +1,24 @@
+from fastapi import APIRouter
+from app.models.wallet import WalletAddressRange, TokenBalancesRequest
+from app.services.investment_wallet import InvestmentWalletService
+from app.services.wallet import WalletService
+
+router = APIRouter(
+    prefix="/wallets",
+    tags=["wallets"]
+)
+
+@router.post("/addresses/index", status_code=200)
+async def index_wallet_addresses(address_range: WalletAddressRange):
+    return await InvestmentWalletService.index_wallet_addresses(address_range.start, address_range.count, address_range.workers)
+
+@router.get("/addresses/{address}", status_code=200)
+async def get_investment_wallet_by_address(address: str):
+    return await InvestmentWalletService.get_investment_wallet_by_address(address)
+
+@router.post("/balances", status_code=200)
+async def get_token_balances(request: TokenBalancesRequest):
+    return await WalletService.get_token_balances(
+        request.chain_id,
+        [(item.address, item.token_address) for item in request.items]
+    )
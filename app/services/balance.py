@@ -0,0 +1,146 @@
+from fastapi import HTTPException
+from app.repositories.balance_snapshot import BalanceSnapshotRepository, LIST_KEYS as SNAPSHOT_KEYS
+from app.repositories.investment_wallet import InvestmentWalletRepository
+from app.repositories.legacy import LegacyRepository, BALANCE_COLUMNS, LIST_KEYS as LEGACY_KEYS
+from app.utils.pagination import iterate_batches, iterate_pages, IN_FILTER_SIZE
+from typing import AsyncIterator
+from app.services.stakekit import StakeKitService
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+import asyncio
+import os
+
+load_dotenv()
+
+# seconds between background refreshes of the balance snapshots
+BALANCE_REFRESH_INTERVAL = float(os.getenv("BALANCE_REFRESH_INTERVAL", "300"))
+# addresses per StakeKit balances call
+BALANCE_BATCH_SIZE = int(os.getenv("BALANCE_BATCH_SIZE", "50"))
+# StakeKit balances calls in flight during a refresh
+BALANCE_CONCURRENCY = int(os.getenv("BALANCE_CONCURRENCY", "4"))
+
+class BalanceService:
+    _task: asyncio.Task | None = None
+
+    @staticmethod
+    async def investment_batches(legacy_ids: list[str] | None = None) -> AsyncIterator[list[dict]]:
+        """Investment legacies page by page, walking the whole table by keyset or `legacy_ids` in chunks"""
+        if legacy_ids is None:
+            async for rows in iterate_batches(
+                lambda after, limit: LegacyRepository.list_page({"investment_enabled": True}, after, limit, BALANCE_COLUMNS),
+                LEGACY_KEYS
+            ):
+                yield rows
+            return
+        for i in range(0, len(legacy_ids), IN_FILTER_SIZE):
+            rows = await LegacyRepository.get_investment_enabled(legacy_ids[i:i + IN_FILTER_SIZE], columns=BALANCE_COLUMNS)
+            if rows:
+                yield rows
+
+    @staticmethod
+    async def refresh(legacy_ids: list[str] | None = None) -> list[dict]:
+        """Fetch the StakeKit balances of investment legacies, a page at a time, and store them as snapshots"""
+        rows = []
+        async for legacies in BalanceService.investment_batches(legacy_ids):
+            rows += await BalanceService.refresh_batch(legacies)
+        return rows
+
+    @staticmethod
+    async def refresh_batch(legacies: list[dict]) -> list[dict]:
+        """Balances of one page of legacies, grouped per integration and batched"""
+        ids = [legacy["id"] for legacy in legacies]
+        chunks = await asyncio.gather(*(
+            InvestmentWalletRepository.get_by_legacy_ids(ids[i:i + IN_FILTER_SIZE], columns="legacy_id,address")
+            for i in range(0, len(ids), IN_FILTER_SIZE)
+        ))
+        wallets = {row["legacy_id"]: row["address"] for chunk in chunks for row in chunk}
+
+        groups: dict[str, list[dict]] = {}
+        for legacy in legacies:
+            if legacy["id"] not in wallets:
+                continue
+            try:
+                integration = StakeKitService.get_stakekit_integration_id(legacy["chain_id"], legacy["token_address"])
+            except HTTPException:
+                # token without a StakeKit integration, nothing to report
+                continue
+            groups.setdefault(integration["id"], []).append(legacy)
+
+        semaphore = asyncio.Semaphore(BALANCE_CONCURRENCY)
+
+        async def fetch_batch(integration_id: str, batch: list[dict]) -> list[dict]:
+            async with semaphore:
+                balances = await StakeKitService.get_stake_balances(
+                    integration_id, [wallets[legacy["id"]] for legacy in batch]
+                )
+            now = datetime.now(timezone.utc).isoformat()
+            return [
+                {
+                    "legacy_id": legacy["id"],
+                    "chain_id": legacy["chain_id"],
+                    "integration_id": integration_id,
+                    "address": wallets[legacy["id"]],
+                    "balances": StakeKitService.format_balance_data(balance),
+                    "refreshed_at": now
+                }
+                for legacy, balance in zip(batch, balances)
+            ]
+
+        batches = await asyncio.gather(*(
+            fetch_batch(integration_id, members[i:i + BALANCE_BATCH_SIZE])
+            for integration_id, members in groups.items()
+            for i in range(0, len(members), BALANCE_BATCH_SIZE)
+        ))
+        rows = [row for batch in batches for row in batch]
+        if rows:
+            await BalanceSnapshotRepository.upsert_many(rows)
+        return rows
+
+    @staticmethod
+    async def get_balances(legacy_ids: list[str] | None = None, refresh: bool = False) -> list[dict]:
+        """Balances of all investment legacies, or of `legacy_ids`, read from the snapshots.
+        Requested legacies without a snapshot yet are fetched from StakeKit"""
+        try:
+            if refresh:
+                return await BalanceService.refresh(legacy_ids)
+
+            if legacy_ids is None:
+                return [row async for row in iterate_pages(BalanceSnapshotRepository.list_page, SNAPSHOT_KEYS)]
+
+            rows = []
+            for i in range(0, len(legacy_ids), IN_FILTER_SIZE):
+                rows += await BalanceSnapshotRepository.get_many(legacy_ids[i:i + IN_FILTER_SIZE])
+            if legacy_ids:
+                missing = set(legacy_ids) - {row["legacy_id"] for row in rows}
+                if missing:
+                    rows += await BalanceService.refresh(list(missing))
+            return rows
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error getting balances: {str(e)}")
+
+    @staticmethod
+    async def refresh_loop():
+        while True:
+            try:
+                # every API worker runs the loop, skip when another one refreshed recently
+                last = await BalanceSnapshotRepository.get_last_refreshed_at()
+                age = (datetime.now(timezone.utc) - datetime.fromisoformat(last)).total_seconds() if last else None
+                if age is None or age >= BALANCE_REFRESH_INTERVAL / 2:
+                    rows = await BalanceService.refresh()
+                    print(f"refreshed {len(rows)} balance snapshots")
+            except Exception as e:
+                print(f"error refreshing balance snapshots: {str(e)}")
+            await asyncio.sleep(BALANCE_REFRESH_INTERVAL)
+
+    @staticmethod
+    def start():
+        BalanceService._task = asyncio.create_task(BalanceService.refresh_loop())
+
+    @staticmethod
+    async def stop():
+        if BalanceService._task:
+            BalanceService._task.cancel()
+            await asyncio.gather(BalanceService._task, return_exceptions=True)
+            BalanceService._task = None
@@ -0,0 +1,28 @@
+from app.repositories.job import JobRepository
+from datetime import datetime, timezone
+import asyncio
+from typing import Any
+
+class JobCheckpoint:
+    """Progress of a running job, persisted after every step so that a
+    restarted worker resumes where the previous one stopped"""
+
+    def __init__(self, job_id: str, data: dict[str, Any] | None = None):
+        self.job_id = job_id
+        self.data = data or {}
+        # steps of one job may run concurrently, saves go out one at a time so none overwrites a newer one
+        self._lock = asyncio.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    async def save(self, key: str, value: Any):
+        async with self._lock:
+            self.data[key] = value
+            now = datetime.now(timezone.utc).isoformat()
+            # saving also renews the job lease
+            await JobRepository.update(self.job_id, {
+                "checkpoint": self.data,
+                "locked_at": now,
+                "updated_at": now
+            })
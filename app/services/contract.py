@@ -1,13 +1,43 @@
 from fastapi import HTTPException
-from app.config.database import supabase
+from app.repositories.contract import ContractRepository, COLUMNS, LIGHT_COLUMNS, LIST_KEYS
+from app.utils.projection import select_columns
+from app.utils.pagination import encode_cursor, decode_cursor, iterate_pages
+from typing import AsyncIterator
 from app.models.contract import Contract
+from app.utils.cache import TTLCache
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
 
 class ContractService:
+    # contracts almost never change, keep the parsed rows (ABI included) per (name, chain_id)
+    CACHE = TTLCache(
+        ttl=float(os.getenv("CONTRACT_CACHE_TTL", "300")),
+        maxsize=int(os.getenv("CONTRACT_CACHE_SIZE", "128"))
+    )
+
+    @staticmethod
+    def get_columns(fields: list[str] | None, light: bool, keyset: bool = False) -> str:
+        """Select list for `fields`, or without the ABIs in `light` mode. With `keyset` the
+        listing keys are always included so the next page can be located"""
+        try:
+            if not fields and not light:
+                return "*"
+            columns = select_columns(fields, COLUMNS, LIGHT_COLUMNS if light else None)
+            if keyset:
+                columns = ",".join(dict.fromkeys(columns.split(",") + list(LIST_KEYS)))
+            return columns
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     @staticmethod
-    async def get_contracts():
+    async def get_contracts(fields: list[str] | None = None, light: bool = False):
+        """All contracts, with only `fields` or without the ABIs in `light` mode"""
+        columns = ContractService.get_columns(fields, light)
+
         try:
-            response = supabase.table('contracts').select('*').execute()
-            return response.data
+            return await ContractRepository.get_all(columns)
             
         except Exception as e:
             raise HTTPException(
@@ -15,18 +45,52 @@ class ContractService:
                 detail=f"Error retrieving contracts information: {str(e)}"
             )
 
+    @staticmethod
+    async def list_contracts(fields: list[str] | None = None, light: bool = False, cursor: str = None, limit: int = 50):
+        """A page of contracts in (chain_id, name, id) order, continued with the returned cursor"""
+        columns = ContractService.get_columns(fields, light, keyset=True)
+        try:
+            after = decode_cursor(cursor, len(LIST_KEYS)) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            rows = await ContractRepository.list_page(after, limit, columns)
+            next_cursor = encode_cursor([rows[-1][key] for key in LIST_KEYS]) if len(rows) == limit else None
+            return {"items": rows, "next_cursor": next_cursor}
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error retrieving contracts information: {str(e)}"
+            )
+
+    @staticmethod
+    def export_contracts(fields: list[str] | None = None, light: bool = False) -> AsyncIterator[dict]:
+        """Every contract, fetched PAGE_SIZE rows at a time"""
+        columns = ContractService.get_columns(fields, light, keyset=True)
+        return iterate_pages(
+            lambda after, limit: ContractRepository.list_page(after, limit, columns),
+            LIST_KEYS
+        )
+
     @staticmethod
     async def get_contract_by_chain_and_name(contract_name: str, chain_id: int):
+        cached = ContractService.CACHE.get((contract_name, chain_id))
+        if cached is not None:
+            return cached
+
         try:
-            response = supabase.table('contracts').select('*').eq('chain_id', chain_id).eq('name', contract_name).execute()
+            contract = await ContractRepository.get_by_chain_and_name(contract_name, chain_id)
             
-            if not response.data:
+            if not contract:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Contract {contract_name} not found for chain ID {chain_id}"
                 )
                 
-            return Contract(**response.data[0])
+            contract = Contract(**contract)
+            ContractService.CACHE.set((contract_name, chain_id), contract)
+            return contract
             
         except Exception as e:
             raise HTTPException(
@@ -37,16 +101,20 @@ class ContractService:
     @staticmethod
     async def create_contract(contract: Contract):
         try:
-            result = supabase.table("contracts").insert({
-                "chain_id": contract.chainId,
+            result = await ContractRepository.insert({
+                "chain_id": contract.chain_id,
                 "address": contract.address,
                 "name": contract.name,
                 "abi": contract.abi
-            }).execute()
-
-            return result.data[0]
+            })
+            ContractService.CACHE.invalidate((contract.name, contract.chain_id))
+            return result
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Error creacting contract: {str(e)}"
             )
+
+    @staticmethod
+    def get_cache_stats():
+        return ContractService.CACHE.stats()
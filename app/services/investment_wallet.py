@@ -1,11 +1,17 @@
 from fastapi import HTTPException
-from app.config.database import supabase
+from app.repositories.investment_wallet import InvestmentWalletRepository
+from app.repositories.wallet_address import WalletAddressRepository
 from app.models.investment_wallet import InvestmentWallet
 from dotenv import load_dotenv
 import httpx
 from datetime import datetime, timezone
 from app.services.wallet import WalletService
+from app.config.process_pool import PROCESS_POOL_SIZE
+from app.utils.identity_map import IdentityMap
+from web3 import Web3
 
+import asyncio
+import os
 import secrets
 import uuid
 
@@ -18,39 +24,144 @@ timeouts = httpx.Timeout(
 
 load_dotenv()
 
+# indexes derived per round and rows per upsert when building the address lookup
+INDEX_WINDOW = 10000
+UPSERT_BATCH = 1000
+
+# pre-derived addresses kept available for new legacies, refilled below the low-water mark
+WALLET_POOL_SIZE = int(os.getenv("WALLET_POOL_SIZE", "500"))
+WALLET_POOL_LOW = int(os.getenv("WALLET_POOL_LOW", "100"))
+WALLET_POOL_INTERVAL = float(os.getenv("WALLET_POOL_INTERVAL", "60"))
+# seconds a worker may hold the pool fill lease before another one takes over
+WALLET_POOL_LEASE_SECONDS = 300
+
 class InvestmentWalletService:
+    _pool_task: asyncio.Task | None = None
+    # set when a claim finds the pool short so the filler does not wait for its next round
+    _pool_low: asyncio.Event | None = None
+    _worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
     @staticmethod
     async def create_investment_wallet(legacy_id: uuid.UUID):
         try:
-            # create investment wallet
-            wallet = supabase.table("investment_wallets").insert({
-                "legacy_id": legacy_id,
-            }).execute()
-
-            # get wallet index
-            new_index = wallet.data[0]["index"]
+            # claim a pre-derived address in one statement
+            claimed = await InvestmentWalletRepository.claim_many([str(legacy_id)])
+            if claimed:
+                return InvestmentWallet(**claimed[0])
+            InvestmentWalletService.request_pool_fill()
 
-            # get wallet from index
-            wallet = WalletService.get_wallet_from_index(new_index)
+            # pool empty, reserve an index and derive inline so the row is inserted complete
+            index = (await WalletAddressRepository.reserve_indexes(1))[0]
+            wallet = WalletService.get_wallet_from_index(index)
 
-            # update investment wallet
-            result = supabase.table("investment_wallets").update({
-                "index": new_index,
+            # keep the address -> index lookup complete for wallets derived outside the pool
+            await WalletAddressRepository.upsert_many([{"index": index, "address": wallet.address}])
+            result = await InvestmentWalletRepository.insert({
+                "legacy_id": legacy_id,
+                "index": index,
                 "address": wallet.address,
-            }).eq("legacy_id", legacy_id).execute()
+            })
 
-            return InvestmentWallet(**result.data[0])
+            return InvestmentWallet(**result)
         except Exception as e:
             raise HTTPException(
                     status_code=500,
                     detail=f"Error creacting investment wallet: {str(e)}"
                 )
-    
+
+    @staticmethod
+    async def create_investment_wallets(legacy_ids: list[str]) -> list[InvestmentWallet]:
+        """create_investment_wallet for many legacies: one claim from the pool, then one index
+        reservation and one insert per table for the legacies the pool could not cover"""
+        try:
+            claimed = await InvestmentWalletRepository.claim_many(legacy_ids)
+            covered = {row["legacy_id"] for row in claimed}
+            remaining = [legacy_id for legacy_id in legacy_ids if legacy_id not in covered]
+            if not remaining:
+                return [InvestmentWallet(**row) for row in claimed]
+            InvestmentWalletService.request_pool_fill()
+
+            indexes = await WalletAddressRepository.reserve_indexes(len(remaining))
+            wallets = await asyncio.to_thread(lambda: [
+                {"legacy_id": legacy_id, "index": index, "address": WalletService.get_wallet_from_index(index).address}
+                for legacy_id, index in zip(remaining, indexes)
+            ])
+
+            await WalletAddressRepository.upsert_many([
+                {"index": wallet["index"], "address": wallet["address"]} for wallet in wallets
+            ])
+            result = await InvestmentWalletRepository.insert_many(wallets)
+            return [InvestmentWallet(**row) for row in claimed + result]
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error creacting investment wallets: {str(e)}"
+                )
+
+    @staticmethod
+    async def fill_wallet_pool() -> int:
+        """Top the pool of available addresses up to WALLET_POOL_SIZE, returns the number added.
+        Only the worker holding the fill lease tops up, the others skip the round"""
+        if not await WalletAddressRepository.lock_pool_fill(InvestmentWalletService._worker_id, WALLET_POOL_LEASE_SECONDS):
+            return 0
+        try:
+            available = await WalletAddressRepository.count_available()
+            if available >= WALLET_POOL_LOW:
+                return 0
+
+            indexes = await WalletAddressRepository.reserve_indexes(WALLET_POOL_SIZE - available)
+            rows = await asyncio.to_thread(lambda: [
+                {"index": index, "address": WalletService.get_wallet_from_index(index).address, "available": True}
+                for index in indexes
+            ])
+            for i in range(0, len(rows), UPSERT_BATCH):
+                await WalletAddressRepository.upsert_many(rows[i:i + UPSERT_BATCH])
+            return len(rows)
+        finally:
+            await WalletAddressRepository.unlock_pool_fill(InvestmentWalletService._worker_id)
+
+    @staticmethod
+    def request_pool_fill():
+        if InvestmentWalletService._pool_low:
+            InvestmentWalletService._pool_low.set()
+
+    @staticmethod
+    async def wallet_pool_loop():
+        while True:
+            try:
+                added = await InvestmentWalletService.fill_wallet_pool()
+                if added:
+                    print(f"added {added} addresses to the investment wallet pool")
+            except Exception as e:
+                print(f"error filling the investment wallet pool: {str(e)}")
+
+            InvestmentWalletService._pool_low.clear()
+            try:
+                await asyncio.wait_for(InvestmentWalletService._pool_low.wait(), timeout=WALLET_POOL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    def start():
+        InvestmentWalletService._pool_low = asyncio.Event()
+        InvestmentWalletService._pool_task = asyncio.create_task(InvestmentWalletService.wallet_pool_loop())
+
+    @staticmethod
+    async def stop():
+        if InvestmentWalletService._pool_task:
+            InvestmentWalletService._pool_task.cancel()
+            await asyncio.gather(InvestmentWalletService._pool_task, return_exceptions=True)
+            InvestmentWalletService._pool_task = None
+
     @staticmethod
     async def get_investment_wallet(legacy_id: uuid.UUID):
         try:
-            result = supabase.table("investment_wallets").select("*").eq("legacy_id", legacy_id).execute()
-            return InvestmentWallet(**result.data[0])
+            # read at most once per request
+            result = IdentityMap.get("investment_wallets", legacy_id)
+            if result is None:
+                result = await InvestmentWalletRepository.get_by_legacy_id(legacy_id)
+                IdentityMap.put("investment_wallets", legacy_id, result)
+            return InvestmentWallet(**result)
         except Exception as e:
             raise HTTPException(
                     status_code=500,
@@ -60,10 +171,54 @@ class InvestmentWalletService:
     @staticmethod
     async def update_staked_at(legacy_id: uuid.UUID):
         try:
-            result = supabase.table("investment_wallets").update({"unstaked_at": datetime.now(timezone.utc).isoformat()}).eq("legacy_id", legacy_id).execute()
-            return InvestmentWallet(**result.data[0])
+            result = await InvestmentWalletRepository.update_by_legacy_id(legacy_id, {"unstaked_at": datetime.now(timezone.utc).isoformat()})
+            IdentityMap.put("investment_wallets", legacy_id, result)
+            return InvestmentWallet(**result)
         except Exception as e:
             raise HTTPException(
                     status_code=500,
                     detail=f"Error getting investment wallet: {str(e)}"
-                )
\ No newline at end of file
+                )
+    @staticmethod
+    async def index_wallet_addresses(start: int, count: int, workers: int = None):
+        """Derive the investment wallet addresses of [start, start + count) and persist the address -> index lookup"""
+        try:
+            # chunks in flight in the shared pool, more than it has processes would only queue
+            workers = min(workers, PROCESS_POOL_SIZE) if workers else None
+            for window_start in range(start, start + count, INDEX_WINDOW):
+                window_count = min(INDEX_WINDOW, start + count - window_start)
+                addresses = await asyncio.to_thread(
+                    lambda: list(WalletService.derive_addresses(window_start, window_count, workers=workers))
+                )
+                for i in range(0, len(addresses), UPSERT_BATCH):
+                    await WalletAddressRepository.upsert_many([
+                        {"index": index, "address": address}
+                        for index, address in addresses[i:i + UPSERT_BATCH]
+                    ])
+
+            return {"start": start, "count": count}
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error indexing wallet addresses: {str(e)}"
+                )
+
+    @staticmethod
+    async def get_investment_wallet_by_address(address: str):
+        try:
+            wallet_address = await WalletAddressRepository.get_by_address(Web3.to_checksum_address(address))
+            if not wallet_address:
+                raise HTTPException(status_code=404, detail=f"Address {address} is not indexed")
+
+            result = await InvestmentWalletRepository.get_by_index(wallet_address["index"])
+            if not result:
+                raise HTTPException(status_code=404, detail=f"No investment wallet for index {wallet_address['index']}")
+
+            return InvestmentWallet(**result)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error getting investment wallet by address: {str(e)}"
+                )
@@ -0,0 +1,314 @@
+from fastapi import HTTPException
+from app.services.watcher import TransactionWatcher
+from app.services.checkpoint import JobCheckpoint
+from app.services.stakekit import StakeKitService
+from app.services.investment_wallet import InvestmentWalletService
+from app.models.legacy import Legacy
+from app.enums.job import JobType, JobStatus
+from app.models.job import Job
+from app.repositories.job import JobRepository
+from app.repositories.legacy import LegacyRepository
+from app.utils.identity_map import IdentityMap
+from postgrest.exceptions import APIError
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+import asyncio
+import contextvars
+import os
+import uuid
+
+load_dotenv()
+
+# seconds to wait for a receipt before giving up on a transaction
+RECEIPT_TIMEOUT = float(os.getenv("RECEIPT_TIMEOUT", "900"))
+# queue workers per process running StakeKit jobs
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+# seconds without a heartbeat before another worker may reclaim a running job
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+# seconds an idle worker sleeps before polling the queue again
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+# claims after which a job that keeps being interrupted is marked failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# seconds between sweeps for executions abandoned before their broadcast was recorded
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", "60"))
+
+QUEUE_JOB_TYPES = [JobType.STAKE, JobType.UNSTAKE, JobType.WITHDRAW]
+
+class JobService:
+    # strong references so running background tasks are not garbage collected
+    _tasks: set[asyncio.Task] = set()
+    # set on enqueue so idle workers pick new jobs up without waiting for the next poll
+    _wakeup: asyncio.Event | None = None
+    _worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def spawn(coro) -> asyncio.Task:
+        # a fresh context, so a task spawned by a request does not keep reading its identity map
+        task = asyncio.create_task(coro, context=contextvars.Context())
+        JobService._tasks.add(task)
+        task.add_done_callback(JobService._tasks.discard)
+        return task
+
+    @staticmethod
+    async def get_job(job_id: uuid.UUID):
+        try:
+            result = await JobRepository.get_by_id(job_id)
+            if not result:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return Job(**result)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error getting job {job_id}: {str(e)}")
+
+    @staticmethod
+    async def open_job(legacy_id: str, job_type: JobType, chain_id: int, status: JobStatus, idempotency_key: str = None) -> tuple[Job, bool]:
+        """Create the job of an operation on a legacy, or return the job a duplicate request attaches to.
+        The flag is False when the caller must not start any new work"""
+        if idempotency_key:
+            existing = await JobRepository.get_by_idempotency_key(legacy_id, idempotency_key)
+            if existing:
+                return JobService.match_idempotent_job(Job(**existing), job_type), False
+
+        data = {
+            "legacy_id": legacy_id,
+            "type": job_type,
+            "status": status,
+            "chain_id": chain_id,
+            "idempotency_key": idempotency_key
+        }
+        if status == JobStatus.RUNNING:
+            data["locked_by"] = JobService._worker_id
+            data["locked_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            return Job(**await JobRepository.insert(data)), True
+        except APIError as e:
+            # unique violation: the same key raced us or the legacy already has an operation in flight
+            if e.code != "23505":
+                raise
+
+        if idempotency_key:
+            existing = await JobRepository.get_by_idempotency_key(legacy_id, idempotency_key)
+            if existing:
+                return JobService.match_idempotent_job(Job(**existing), job_type), False
+
+        existing = await JobRepository.get_active_by_legacy(legacy_id)
+        if not existing:
+            raise HTTPException(status_code=409, detail=f"Conflicting job for legacy {legacy_id}, retry the request")
+
+        job = Job(**existing)
+        if job.type != job_type:
+            raise HTTPException(status_code=409, detail=f"Legacy {legacy_id} already has a {job.type} job in progress")
+        return job, False
+
+    @staticmethod
+    def match_idempotent_job(job: Job, job_type: JobType) -> Job:
+        """The job an Idempotency-Key was first used for, which must be the same operation"""
+        if job.type != job_type:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Idempotency-Key was already used for a {job.type} job on legacy {job.legacy_id}"
+            )
+        return job
+
+    @staticmethod
+    async def begin_execution(legacy_id: str, chain_id: int, idempotency_key: str = None) -> tuple[Job, bool]:
+        """Hold the legacy for an executeLegacy broadcast, see open_job"""
+        return await JobService.open_job(legacy_id, JobType.EXECUTE, chain_id, JobStatus.RUNNING, idempotency_key)
+
+    @staticmethod
+    async def submit_execution(job: Job, tx_hash: str) -> Job:
+        """Record the broadcast executeLegacy transaction and track its receipt in the background"""
+        job = Job(**await JobRepository.update(job.id, {
+            "status": JobStatus.SUBMITTED,
+            "tx_hash": tx_hash,
+            "locked_by": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }))
+        JobService.spawn(JobService.track_execution(job))
+        return job
+
+    @staticmethod
+    async def fail_job(job: Job, error: str):
+        await JobRepository.update(job.id, {
+            "status": JobStatus.FAILED,
+            "error": error,
+            "locked_by": None,
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        })
+
+    @staticmethod
+    async def enqueue(legacy_id: str, job_type: JobType, chain_id: int, idempotency_key: str = None) -> Job:
+        """Queue a StakeKit flow for the workers, the caller polls the returned job"""
+        job, created = await JobService.open_job(legacy_id, job_type, chain_id, JobStatus.QUEUED, idempotency_key)
+        if created and JobService._wakeup:
+            JobService._wakeup.set()
+        return job
+
+    @staticmethod
+    async def run_job(job: Job):
+        """Run a claimed job, resuming from its checkpoint if an earlier attempt was interrupted"""
+        checkpoint = JobCheckpoint(job.id, job.checkpoint)
+        heartbeat = JobService.spawn(JobService.heartbeat(job.id))
+        try:
+            if job.attempts and job.attempts > JOB_MAX_ATTEMPTS:
+                raise RuntimeError(f"abandoned after {job.attempts - 1} attempts")
+
+            # the job is one unit of work: the legacy and its investment wallet are read once, together
+            with IdentityMap.scope():
+                row = await LegacyRepository.get_with_investment_wallet(job.legacy_id)
+                if not row:
+                    raise RuntimeError("legacy not found")
+                IdentityMap.put("investment_wallets", job.legacy_id, row.pop("investment_wallets"))
+                IdentityMap.put("legacies", job.legacy_id, row)
+                legacy = Legacy(**row)
+
+                if job.type == JobType.STAKE:
+                    result = await StakeKitService.perform_staking_action(legacy, "enter", checkpoint)
+                elif job.type == JobType.UNSTAKE:
+                    result = await StakeKitService.perform_staking_action(legacy, "exit", checkpoint)
+                    await InvestmentWalletService.update_staked_at(legacy.id)
+                else:
+                    result = await StakeKitService.withdraw(legacy, checkpoint)
+
+            await JobRepository.update(job.id, {
+                "status": JobStatus.CONFIRMED,
+                "result": result,
+                "locked_by": None,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
+        except asyncio.CancelledError:
+            # shutting down, hand the job back with its checkpoint for the next worker. The claim
+            # counted an attempt, give it back so rolling deploys do not exhaust JOB_MAX_ATTEMPTS
+            try:
+                await asyncio.shield(JobRepository.update(job.id, {
+                    "status": JobStatus.QUEUED,
+                    "attempts": max((job.attempts or 1) - 1, 0),
+                    "locked_by": None,
+                    "locked_at": None
+                }))
+            except Exception as e:
+                # the lease expires and the job is reclaimed, the cancellation must still go through
+                print(f"error requeueing job {job.id}: {str(e)}")
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            print(f"error running job {job.id}: {error}")
+            try:
+                await JobService.fail_job(job, error)
+            except Exception as e:
+                # the lease expires and the job is reclaimed, counting another attempt
+                print(f"error failing job {job.id}: {str(e)}")
+        finally:
+            heartbeat.cancel()
+
+    @staticmethod
+    async def heartbeat(job_id: str):
+        """Renew the lease of a running job so other workers do not reclaim it"""
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await JobRepository.update(job_id, {"locked_at": datetime.now(timezone.utc).isoformat()})
+            except Exception as e:
+                print(f"error renewing lease of job {job_id}: {str(e)}")
+
+    @staticmethod
+    async def worker():
+        """Claim and run queued jobs until cancelled"""
+        while True:
+            try:
+                row = await JobRepository.claim(JobService._worker_id, QUEUE_JOB_TYPES, JOB_LEASE_SECONDS)
+            except Exception as e:
+                print(f"error claiming job: {str(e)}")
+                row = None
+
+            if row:
+                # a worker that dies here is never restarted, so nothing may escape the loop
+                try:
+                    await JobService.run_job(Job(**row))
+                except Exception as e:
+                    print(f"error running job {row.get('id')}: {str(e)}")
+                continue
+
+            JobService._wakeup.clear()
+            try:
+                await asyncio.wait_for(JobService._wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def sweep_stale_executions() -> int:
+        """Fail executions whose worker died before recording a broadcast, they would hold
+        their legacy forever. Returns the number of jobs failed"""
+        locked_before = (datetime.now(timezone.utc) - timedelta(seconds=JOB_LEASE_SECONDS)).isoformat()
+        rows = await JobRepository.get_stale(JobType.EXECUTE, JobStatus.RUNNING, locked_before)
+        for row in rows:
+            await JobService.fail_job(Job(**row), "interrupted before the transaction was recorded")
+        return len(rows)
+
+    @staticmethod
+    async def sweep_loop():
+        # a crashed worker is restarted before its lease expires, so sweeping once at startup is not enough
+        while True:
+            try:
+                failed = await JobService.sweep_stale_executions()
+                if failed:
+                    print(f"failed {failed} abandoned executions")
+            except Exception as e:
+                print(f"error sweeping stale executions: {str(e)}")
+            await asyncio.sleep(JOB_SWEEP_INTERVAL)
+
+    @staticmethod
+    async def track_execution(job: Job):
+        """Wait for the execution receipt and record it on the job and the legacy"""
+        try:
+            receipt = await TransactionWatcher.wait_for_receipt(job.chain_id, job.tx_hash, timeout=RECEIPT_TIMEOUT)
+            now = datetime.now(timezone.utc).isoformat()
+            result = {"block_number": receipt.blockNumber, "gas_used": receipt.gasUsed}
+
+            if receipt.status == 1:
+                await LegacyRepository.update(job.legacy_id, {
+                    "execution_tx_hash": job.tx_hash,
+                    "executed_at": now
+                })
+                await JobRepository.update(job.id, {"status": JobStatus.CONFIRMED, "result": result, "updated_at": now})
+            else:
+                await JobRepository.update(job.id, {
+                    "status": JobStatus.FAILED,
+                    "result": result,
+                    "error": "transaction reverted",
+                    "updated_at": now
+                })
+        except asyncio.CancelledError:
+            # shutting down, the job stays submitted and is resumed on the next startup
+            raise
+        except Exception as e:
+            error = f"no receipt after {RECEIPT_TIMEOUT}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+            print(f"error tracking job {job.id}: {error}")
+            try:
+                await JobRepository.update(job.id, {
+                    "status": JobStatus.FAILED,
+                    "error": error,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                })
+            except Exception as e:
+                # the job stays submitted and tracking resumes on the next startup
+                print(f"error failing job {job.id}: {str(e)}")
+
+    @staticmethod
+    async def start():
+        """Resume tracking of executions that were still unconfirmed when the app stopped
+        and start the queue workers"""
+        for row in await JobRepository.get_by_status(JobType.EXECUTE, JobStatus.SUBMITTED):
+            JobService.spawn(JobService.track_execution(Job(**row)))
+
+        JobService._wakeup = asyncio.Event()
+        JobService.spawn(JobService.sweep_loop())
+        for _ in range(JOB_CONCURRENCY):
+            JobService.spawn(JobService.worker())
+
+    @staticmethod
+    async def stop():
+        for task in list(JobService._tasks):
+            task.cancel()
+        await asyncio.gather(*JobService._tasks, return_exceptions=True)
@@ -1,11 +1,11 @@
 from fastapi import HTTPException
-from app.config.database import supabase
+from app.repositories.legacy import LegacyRepository, SIGNATURE_COLUMNS, LIST_KEYS
 from app.models.legacy import Legacy
 # from app.models.investment_wallet import InvestmentWallet
 from app.services.signature import SignatureService
 from app.services.contract import ContractService
 from dotenv import load_dotenv
-from web3 import Web3
+from app.config.rpc import get_async_web3
 import os
 # import httpx
 # from app.enums.chain import Chain
@@ -14,40 +14,56 @@ from app.enums.token_type import TokenType
 from app.services.stakekit import StakeKitService
 # from app.services.wallet import WalletService
 from app.services.investment_wallet import InvestmentWalletService
+from app.services.nonce import NonceManager
+from app.services.job import JobService
+from app.enums.job import JobType
+from app.utils.identity_map import IdentityMap
+from app.utils.pagination import encode_cursor, decode_cursor, iterate_pages, iterate_batches, IN_FILTER_SIZE
+from typing import AsyncIterator
 # from datetime import datetime, timedelta, timezone
+import asyncio
 import secrets
 import uuid
 
 load_dotenv()
 
+# chunks of a bulk signature check verified at a time in the shared process pool
+SIGNATURE_VERIFY_WORKERS = int(os.getenv("SIGNATURE_VERIFY_WORKERS", str(os.cpu_count() or 1)))
+# legacies per batch create or batch signature request
+LEGACY_BATCH_SIZE = int(os.getenv("LEGACY_BATCH_SIZE", "500"))
+
 class LegacyService:
+    @staticmethod
+    def build_legacy_row(legacy: Legacy, contract_address: str) -> dict:
+        return {
+            "blockchain_id": secrets.randbelow(2**256),
+            "chain_id": legacy.chain_id,
+            "token_type": legacy.token_type,
+            "token_address": legacy.token_address,
+            "token_id": legacy.token_type == TokenType.ERC721 and legacy.token_id or None,
+            "amount": legacy.amount,
+            "wallet": legacy.wallet,
+            "heir_wallet": legacy.heir_wallet,
+            "signature": None,
+            "name": legacy.name,
+            "telegram_id": legacy.telegram_id,
+            "telegram_id_emergency": legacy.telegram_id_emergency,
+            "telegram_id_heir": legacy.telegram_id_heir,
+            "contract_address": contract_address,   
+            "signal_confirmation_retries": legacy.signal_confirmation_retries,
+            "signal_requested_at": legacy.signal_requested_at,
+            "signal_received_at": legacy.signal_received_at,
+            "investment_enabled": legacy.investment_enabled,
+            "investment_risk": legacy.investment_risk,
+        }
+
     @staticmethod
     async def create_legacy(legacy: Legacy):
         try:
             print(f"create legacy {legacy.name}")
             contract = await ContractService.get_contract_by_chain_and_name("AeviaProtocol", legacy.chain_id)
-            result = supabase.table("legacies").insert({
-                "blockchain_id": secrets.randbelow(2**256),
-                "chain_id": legacy.chain_id,
-                "token_type": legacy.token_type,
-                "token_address": legacy.token_address,
-                "token_id": legacy.token_type == TokenType.ERC721 and legacy.token_id or None,
-                "amount": legacy.amount,
-                "wallet": legacy.wallet,
-                "heir_wallet": legacy.heir_wallet,
-                "signature": None,
-                "name": legacy.name,
-                "telegram_id": legacy.telegram_id,
-                "telegram_id_emergency": legacy.telegram_id_emergency,
-                "telegram_id_heir": legacy.telegram_id_heir,
-                "contract_address": contract.address,   
-                "signal_confirmation_retries": legacy.signal_confirmation_retries,
-                "signal_requested_at": legacy.signal_requested_at,
-                "signal_received_at": legacy.signal_received_at,
-                "investment_enabled": legacy.investment_enabled,
-                "investment_risk": legacy.investment_risk,
-            }).execute()
-            legacy = Legacy(**result.data[0])
+            result = await LegacyRepository.insert(LegacyService.build_legacy_row(legacy, contract.address))
+            legacy = Legacy(**result)
 
             if legacy.investment_enabled:
                 investment_wallet = await InvestmentWalletService.create_investment_wallet(legacy.id)
@@ -60,11 +76,73 @@ class LegacyService:
                     detail=f"Error creacting legacy: {str(e)}"
                 )
 
+    @staticmethod
+    async def create_legacies(legacies: list[Legacy]):
+        """create_legacy for many legacies: one contract lookup per chain, one insert for the
+        legacies and bulk allocation of the investment wallets"""
+        if len(legacies) > LEGACY_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {LEGACY_BATCH_SIZE} legacies per batch")
+        if not legacies:
+            return []
+        try:
+            print(f"create {len(legacies)} legacies")
+            chain_ids = sorted({legacy.chain_id for legacy in legacies})
+            contracts = await asyncio.gather(*[
+                ContractService.get_contract_by_chain_and_name("AeviaProtocol", chain_id) for chain_id in chain_ids
+            ])
+            addresses = {chain_id: contract.address for chain_id, contract in zip(chain_ids, contracts)}
+
+            rows = await LegacyRepository.insert_many([
+                LegacyService.build_legacy_row(legacy, addresses[legacy.chain_id]) for legacy in legacies
+            ])
+            created = [Legacy(**row) for row in rows]
+
+            investment_ids = [legacy.id for legacy in created if legacy.investment_enabled]
+            if investment_ids:
+                wallets = await InvestmentWalletService.create_investment_wallets(investment_ids)
+                wallet_addresses = {wallet.legacy_id: wallet.address for wallet in wallets}
+                for legacy in created:
+                    legacy.investment_wallet = wallet_addresses.get(legacy.id, legacy.investment_wallet)
+
+            return created
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error creacting legacies: {str(e)}"
+                )
+
+    @staticmethod
+    async def find_legacy(legacy_id: uuid.UUID) -> dict | None:
+        """Legacy row, read at most once per request"""
+        result = IdentityMap.get("legacies", legacy_id)
+        if result is None:
+            result = await LegacyRepository.get_by_id(legacy_id)
+            IdentityMap.put("legacies", legacy_id, result)
+        return result
+
     @staticmethod
     async def get_legacy(legacy_id: uuid.UUID):
         try:
-            result = supabase.table("legacies").select("*").eq("id", legacy_id).execute()
-            return Legacy(**result.data[0])
+            result = await LegacyService.find_legacy(legacy_id)
+            return Legacy(**result)
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error getting legacy: {str(e)}"
+                )
+
+    @staticmethod
+    async def get_legacy_with_investment_wallet(legacy_id: uuid.UUID):
+        """get_legacy that also loads the investment wallet in the same query, for the
+        services called afterwards in the request"""
+        try:
+            result = IdentityMap.get("legacies", legacy_id)
+            if result is None or IdentityMap.get("investment_wallets", legacy_id) is None:
+                result = await LegacyRepository.get_with_investment_wallet(legacy_id)
+                if result:
+                    IdentityMap.put("investment_wallets", legacy_id, result.pop("investment_wallets"))
+                    IdentityMap.put("legacies", legacy_id, result)
+            return Legacy(**result)
         except Exception as e:
             raise HTTPException(
                     status_code=500,
@@ -72,24 +150,33 @@ class LegacyService:
                 )
 
     @staticmethod
-    async def get_signature_message(id: uuid.UUID):
+    def signature_fields(legacy: Legacy) -> tuple:
+        """Legacy message fields in SignatureService argument order"""
+        return (
+            legacy.blockchain_id,
+            legacy.token_type,
+            legacy.token_address,
+            legacy.token_id,
+            legacy.amount,
+            legacy.wallet,
+            legacy.heir_wallet
+        )
+
+    @staticmethod
+    async def get_signature_message(id: uuid.UUID, include_digest: bool = False):
         try:
-            result = supabase.table("legacies").select("*").eq("id", id).execute()
-            if not result.data:
+            result = await LegacyService.find_legacy(id)
+            if not result:
                 raise HTTPException(status_code=404, detail="Legacy not found")
             
-            legacy = Legacy(**result.data[0])
+            legacy = Legacy(**result)
 
             service = SignatureService(legacy.contract_address, legacy.chain_id)
-            message = service.get_signature_message(
-                legacy.blockchain_id,
-                legacy.token_type,
-                legacy.token_address,
-                legacy.token_id,
-                legacy.amount,
-                legacy.wallet,
-                legacy.heir_wallet
-            )
+            fields = LegacyService.signature_fields(legacy)
+            message = service.get_signature_message(*fields)
+            if include_digest:
+                # the hash the wallet signs, so callers do not have to encode the typed data again
+                return {"typed_data": message, "digest": "0x" + service.get_digest(*fields).hex()}
             return message
         except Exception as e:
             raise HTTPException(
@@ -97,45 +184,148 @@ class LegacyService:
                     detail=f"Error getting signature message: {str(e)}"
                 )
 
+    @staticmethod
+    async def get_signature_messages(ids: list[str], include_digest: bool = False):
+        """get_signature_message for many legacies from a single query, in request order"""
+        if len(ids) > LEGACY_BATCH_SIZE:
+            raise HTTPException(status_code=400, detail=f"At most {LEGACY_BATCH_SIZE} legacies per batch")
+        try:
+            # only the message columns are loaded, so the rows skip model validation
+            rows = await LegacyRepository.get_many(ids, columns=SIGNATURE_COLUMNS) if ids else []
+            legacies = {row["id"]: Legacy.model_construct(**row) for row in rows}
+            payloads = []
+            for legacy_id in ids:
+                legacy = legacies.get(legacy_id)
+                if not legacy:
+                    raise HTTPException(status_code=404, detail=f"Legacy {legacy_id} not found")
+
+                service = SignatureService(legacy.contract_address, legacy.chain_id)
+                fields = LegacyService.signature_fields(legacy)
+                payload = {"id": legacy.id, "typed_data": service.get_signature_message(*fields)}
+                if include_digest:
+                    payload["digest"] = "0x" + service.get_digest(*fields).hex()
+                payloads.append(payload)
+            return payloads
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(
+                    status_code=500,
+                    detail=f"Error getting signature messages: {str(e)}"
+                )
+
     @staticmethod
     async def set_signature(id: uuid.UUID, signature: str):
         try:
-            result = supabase.table("legacies").select("*").eq("id", id).execute()
-            if not result.data:
+            result = await LegacyService.find_legacy(id)
+            if not result:
                 raise HTTPException(status_code=404, detail="Legacy not found")
-                
 
-            result = supabase.table("legacies").update({
+            legacy = Legacy(**result)
+            # a bad signature would otherwise only show up as a reverted executeLegacy
+            service = SignatureService(legacy.contract_address, legacy.chain_id)
+            valid = await asyncio.to_thread(
+                service.verify, signature, legacy.wallet, *LegacyService.signature_fields(legacy)
+            )
+            if not valid:
+                raise HTTPException(status_code=400, detail=f"Signature was not produced by {legacy.wallet}")
+
+            result = await LegacyRepository.update(id, {
                 "signature": signature
-            }).eq("id", id).execute()
+            })
+            IdentityMap.put("legacies", id, result)
 
-            return Legacy(**result.data[0])
+            return Legacy(**result)
+        except HTTPException as e:
+            raise e
         except Exception as e:
             raise HTTPException(
                     status_code=500,
                     detail=f"Error setting signature: {str(e)}"
                 )
 
+    @staticmethod
+    async def signed_batches(legacy_ids: list[str] | None = None) -> AsyncIterator[list[dict]]:
+        """Signed legacies page by page, walking the whole table by keyset or `legacy_ids` in chunks"""
+        if legacy_ids is None:
+            async for rows in iterate_batches(LegacyRepository.get_signed_page, LIST_KEYS):
+                yield rows
+            return
+        for i in range(0, len(legacy_ids), IN_FILTER_SIZE):
+            yield await LegacyRepository.get_signed(legacy_ids[i:i + IN_FILTER_SIZE])
+
+    @staticmethod
+    async def verify_signatures(legacy_ids: list[str] | None = None):
+        """Re-check stored signatures, e.g. before a mass execution"""
+        try:
+            checked = 0
+            invalid = []
+            async for rows in LegacyService.signed_batches(legacy_ids):
+                items = [
+                    (legacy.id, legacy.contract_address, legacy.chain_id,
+                     LegacyService.signature_fields(legacy), legacy.wallet, legacy.signature)
+                    for legacy in (Legacy.model_construct(**row) for row in rows)
+                ]
+                results = await asyncio.to_thread(SignatureService.verify_many, items, SIGNATURE_VERIFY_WORKERS)
+                checked += len(results)
+                invalid += [legacy_id for legacy_id, valid in results if not valid]
+            return {"checked": checked, "valid": checked - len(invalid), "invalid": invalid}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error verifying signatures: {str(e)}")
+
     @staticmethod
     async def get_last_by_user(user: str):
         try:
-            result = supabase.table("legacies").select("*").eq("telegram_id", user).order("created_at", desc=True).limit(1).execute()
-            if not result.data:
+            result = await LegacyRepository.get_last_by_user(user)
+            if not result:
                 raise HTTPException(status_code=404, detail="No legacy found for user")
             
-            return Legacy(**result.data[0])
+            return Legacy(**result)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error getting last legacy for user {user}: {str(e)}")
         
 
     @staticmethod
-    async def execute_legacy(legacy_id: uuid.UUID):
+    def list_filters(user: str = None, chain_id: int = None) -> dict:
+        filters = {}
+        if user:
+            filters["telegram_id"] = user
+        if chain_id is not None:
+            filters["chain_id"] = chain_id
+        return filters
+
+    @staticmethod
+    async def list_legacies(user: str = None, chain_id: int = None, cursor: str = None, limit: int = 50):
+        """A page of legacies, oldest first, continued with the returned cursor"""
+        try:
+            after = decode_cursor(cursor, len(LIST_KEYS)) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            rows = await LegacyRepository.list_page(LegacyService.list_filters(user, chain_id), after, limit)
+            next_cursor = encode_cursor([rows[-1][key] for key in LIST_KEYS]) if len(rows) == limit else None
+            return {"items": rows, "next_cursor": next_cursor}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error listing legacies: {str(e)}")
+
+    @staticmethod
+    def export_legacies(user: str = None, chain_id: int = None) -> AsyncIterator[dict]:
+        """Every matching legacy, fetched PAGE_SIZE rows at a time"""
+        filters = LegacyService.list_filters(user, chain_id)
+        return iterate_pages(
+            lambda after, limit: LegacyRepository.list_page(filters, after, limit),
+            LIST_KEYS
+        )
+
+    @staticmethod
+    async def execute_legacy(legacy_id: uuid.UUID, idempotency_key: str = None):
         try:
             legacy = await LegacyService.get_legacy(legacy_id)
             if legacy.investment_enabled:
-                result = await LegacyService.execute_legacy_investment(legacy)
+                result = await LegacyService.execute_legacy_investment(legacy, idempotency_key)
             else:
-                result = await LegacyService.execute_legacy_standard(legacy)
+                result = await LegacyService.execute_legacy_standard(legacy, idempotency_key)
 
             return result
             
@@ -146,18 +336,15 @@ class LegacyService:
             
 
     @staticmethod
-    async def execute_legacy_standard(legacy: Legacy):
+    async def execute_legacy_standard(legacy: Legacy, idempotency_key: str = None):
         try:
             
-            web3_url = os.getenv(f"WEB3_URL_{legacy.chain_id}")
-            
             # Get contract info
             contract = await ContractService.get_contract_by_chain_and_name("AeviaProtocol", legacy.chain_id)
             print(f"interact with {contract.name} contract")
             
-            # Initialize web3
-            print(f"connecting to {web3_url}")
-            w3 = Web3(Web3.HTTPProvider(web3_url))
+            # Pooled web3 for the legacy chain
+            w3 = get_async_web3(legacy.chain_id)
             
             operator_private_key = os.getenv("OPERATOR_PRIVATE_KEY")
             account = w3.eth.account.from_key(operator_private_key)
@@ -168,41 +355,67 @@ class LegacyService:
                 abi=contract.abi
             )
 
-            # Build transaction
-            tx = contract_instance.functions.executeLegacy(
-                int(legacy.blockchain_id),
-                legacy.token_type.value,
-                legacy.token_address,
-                int(legacy.token_id if legacy.token_id else 0),
-                int(legacy.amount),
-                legacy.wallet,
-                legacy.heir_wallet,
-                legacy.signature
-            ).build_transaction({
-                "from": operator_address,
-                "nonce": w3.eth.get_transaction_count(operator_address),
-                "gas": 2000000,
-                "gasPrice": w3.eth.gas_price
-            })
+            # one execution per legacy, a retried or concurrent request gets the existing job
+            job, created = await JobService.begin_execution(legacy.id, legacy.chain_id, idempotency_key)
+            if not created:
+                return {
+                    "legacy": legacy,
+                    "job_id": job.id,
+                    "status": job.status,
+                    "transaction": job.tx_hash
+                }
 
-            # Sign and send transaction
-            signed_tx = w3.eth.account.sign_transaction(tx, operator_private_key)
-            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            try:
+                nonce = await NonceManager.allocate(w3, legacy.chain_id, operator_address)
+            except Exception as e:
+                await JobService.fail_job(job, str(e))
+                raise
+            try:
+                # Build transaction
+                tx = await contract_instance.functions.executeLegacy(
+                    int(legacy.blockchain_id),
+                    legacy.token_type.value,
+                    legacy.token_address,
+                    int(legacy.token_id if legacy.token_id else 0),
+                    int(legacy.amount),
+                    legacy.wallet,
+                    legacy.heir_wallet,
+                    legacy.signature
+                ).build_transaction({
+                    "from": operator_address,
+                    "nonce": nonce,
+                    "gas": 2000000,
+                    "gasPrice": await w3.eth.gas_price
+                })
+
+                # Sign and send transaction
+                signed_tx = w3.eth.account.sign_transaction(tx, operator_private_key)
+                tx_hash = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+            except Exception as e:
+                await NonceManager.release(legacy.chain_id, operator_address, nonce, failed=True)
+                await JobService.fail_job(job, str(e))
+                raise
+            await NonceManager.release(legacy.chain_id, operator_address, nonce)
             
-            # Wait for transaction receipt
-            tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+            # Confirmation is tracked in the background, the caller polls the job
+            job = await JobService.submit_execution(job, tx_hash.to_0x_hex())
             
             return {
                 "legacy": legacy,
-                "transaction": tx_receipt.transactionHash.hex()
+                "job_id": job.id,
+                "status": job.status,
+                "transaction": job.tx_hash
             }
             
+        except HTTPException as e:
+            raise e
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error executing legacy {legacy.blockchain_id}: {str(e)}")
     
     @staticmethod
     async def get_balance(legacy_id: uuid.UUID):
-        legacy = await LegacyService.get_legacy(legacy_id)
+        # one query for the legacy and the investment wallet get_stake_balance needs
+        legacy = await LegacyService.get_legacy_with_investment_wallet(legacy_id)
         if not legacy:
             raise HTTPException(status_code=404, detail="Legacy not found")
         if not legacy.investment_enabled:
@@ -212,17 +425,16 @@ class LegacyService:
         return StakeKitService.format_balance_data(balances)
 
     @staticmethod
-    async def execute_legacy_investment(legacy: Legacy):
-        response = await StakeKitService.perform_staking_action(legacy, "exit")
-        await InvestmentWalletService.update_staked_at(legacy.id)
-        return response
+    async def execute_legacy_investment(legacy: Legacy, idempotency_key: str = None):
+        # the unstake runs on a queue worker, it also updates staked_at when done
+        return await JobService.enqueue(legacy.id, JobType.UNSTAKE, legacy.chain_id, idempotency_key)
             
     @staticmethod
-    async def stake(legacy_id: uuid.UUID):
+    async def stake(legacy_id: uuid.UUID, idempotency_key: str = None):
         legacy = await LegacyService.get_legacy(legacy_id)
         if not legacy:
             raise HTTPException(status_code=404, detail="Legacy not found")
-        return await StakeKitService.perform_staking_action(legacy, "enter")
+        return await JobService.enqueue(legacy.id, JobType.STAKE, legacy.chain_id, idempotency_key)
 
     @staticmethod
     async def claim(legacy_id: uuid.UUID):
@@ -232,8 +444,8 @@ class LegacyService:
         return await StakeKitService.claim(legacy)
 
     @staticmethod
-    async def withdraw(legacy_id: uuid.UUID):
+    async def withdraw(legacy_id: uuid.UUID, idempotency_key: str = None):
         legacy = await LegacyService.get_legacy(legacy_id)
         if not legacy:
             raise HTTPException(status_code=404, detail="Legacy not found")
-        return await StakeKitService.withdraw(legacy)
\ No newline at end of file
+        return await JobService.enqueue(legacy.id, JobType.WITHDRAW, legacy.chain_id, idempotency_key)
\ No newline at end of file
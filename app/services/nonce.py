@@ -0,0 +1,36 @@
+from web3 import AsyncWeb3
+from app.repositories.nonce import NonceRepository
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# seconds after which a nonce that was never released is handed out again
+NONCE_LEASE_SECONDS = int(os.getenv("NONCE_LEASE_SECONDS", "120"))
+
+class NonceManager:
+    """Hands out nonces for a sending account per chain from the database, so
+    transactions of every worker process can be in flight at once instead of
+    all reading the same pending count from the node"""
+
+    @staticmethod
+    async def allocate(w3: AsyncWeb3, chain_id: int, address: str) -> int:
+        """Reserve the next nonce for `address` on `chain_id`"""
+        address = address.lower()
+        nonce = await NonceRepository.allocate(chain_id, address, None, NONCE_LEASE_SECONDS)
+        if nonce is None:
+            # the node's pending count is the first nonce not yet used by a
+            # contiguous transaction, so resyncing also fills any gap
+            pending = await w3.eth.get_transaction_count(AsyncWeb3.to_checksum_address(address), "pending")
+            nonce = await NonceRepository.allocate(chain_id, address, pending, NONCE_LEASE_SECONDS)
+        return nonce
+
+    @staticmethod
+    async def release(chain_id: int, address: str, nonce: int, failed: bool = False):
+        """Release a reserved nonce once its transaction was broadcast, or when
+        sending failed, in which case the next allocation resyncs from the node"""
+        try:
+            await NonceRepository.release(chain_id, address.lower(), nonce, failed)
+        except Exception as e:
+            # the lease expires after NONCE_LEASE_SECONDS, the transaction outcome matters more
+            print(f"error releasing nonce {nonce} on chain {chain_id}: {str(e)}")
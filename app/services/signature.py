@@ -1,4 +1,8 @@
-from eth_account.messages import encode_typed_data
+from app.config.process_pool import map_in_pool
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature, ValidationError
+from eth_utils import keccak
+from functools import lru_cache
 from web3 import Web3
 from enum import IntEnum
 
@@ -7,10 +11,86 @@ class TokenType(IntEnum):
     ERC721 = 1
     ERC1155 = 2
 
+DOMAIN_NAME = "AeviaProtocol"
+DOMAIN_VERSION = "1.0.0"
+
+EIP712_TYPES = {
+    "EIP712Domain": [
+        {"name": "name", "type": "string"},
+        {"name": "version", "type": "string"},
+        {"name": "chainId", "type": "uint256"},
+        {"name": "verifyingContract", "type": "address"}
+    ],
+    "Legacy": [
+        {"name": "legacyId", "type": "uint256"},
+        {"name": "tokenType", "type": "uint8"},
+        {"name": "tokenAddress", "type": "address"},
+        {"name": "tokenId", "type": "uint256"},
+        {"name": "amount", "type": "uint256"},
+        {"name": "from", "type": "address"},
+        {"name": "to", "type": "address"}
+    ]
+}
+
+SECP256K1_HALF_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141 // 2
+
+DOMAIN_TYPEHASH = keccak(text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+LEGACY_TYPEHASH = keccak(text="Legacy(uint256 legacyId,uint8 tokenType,address tokenAddress,uint256 tokenId,uint256 amount,address from,address to)")
+
+@lru_cache(maxsize=4096)
+def to_checksum_address(address: str) -> str:
+    # the same contract, token and wallet addresses come back on every call
+    return Web3.to_checksum_address(address)
+
+def _encode_uint(value) -> bytes:
+    return int(value or 0).to_bytes(32, "big")
+
+def _encode_address(address: str) -> bytes:
+    return bytes.fromhex(address[2:]).rjust(32, b"\0")
+
+@lru_cache(maxsize=256)
+def get_domain_separator(contract_address: str, chain_id: int) -> bytes:
+    """EIP-712 domain separator of a deployed AeviaProtocol contract"""
+    return keccak(
+        DOMAIN_TYPEHASH
+        + keccak(text=DOMAIN_NAME)
+        + keccak(text=DOMAIN_VERSION)
+        + _encode_uint(chain_id)
+        + _encode_address(contract_address)
+    )
+
+def recover_signer(digest: bytes, signature: str) -> str | None:
+    """Address that signed `digest`, or None for a malformed or malleable (high s) signature"""
+    try:
+        raw = bytes.fromhex(signature.removeprefix("0x"))
+        if len(raw) != 65:
+            return None
+        r = int.from_bytes(raw[:32], "big")
+        s = int.from_bytes(raw[32:64], "big")
+        v = raw[64] - 27 if raw[64] >= 27 else raw[64]
+        if s > SECP256K1_HALF_N:
+            return None
+        return keys.Signature(vrs=(v, r, s)).recover_public_key_from_msg_hash(digest).to_checksum_address()
+    except (ValueError, BadSignature, ValidationError):
+        return None
+
+def _verify_chunk(items: list[tuple]) -> list[tuple[str, bool]]:
+    """Verify (id, contract_address, chain_id, message fields, signer, signature) items (runs in pool workers too)"""
+    results = []
+    for item_id, contract_address, chain_id, fields, signer, signature in items:
+        try:
+            valid = SignatureService(contract_address, chain_id).verify(signature, signer, *fields)
+        except (TypeError, ValueError):
+            # incomplete legacy, e.g. no contract address yet
+            valid = False
+        results.append((item_id, valid))
+    return results
+
 class SignatureService:
     def __init__(self, contract_address: str, chain_id: int):
-        self.contract_address = Web3.to_checksum_address(contract_address)
+        self.contract_address = to_checksum_address(contract_address)
         self.chain_id = chain_id
+        self.domain_separator = get_domain_separator(self.contract_address, int(chain_id))
         
     def get_signature_message(
                     self,
@@ -26,13 +106,13 @@ class SignatureService:
         """
         
         # Convert addresses to checksum format
-        token_address = Web3.to_checksum_address(token_address)
-        from_address = Web3.to_checksum_address(from_address)
-        to_address = Web3.to_checksum_address(to_address)
+        token_address = to_checksum_address(token_address)
+        from_address = to_checksum_address(from_address)
+        to_address = to_checksum_address(to_address)
         
         domain_data = {
-            "name": "AeviaProtocol",
-            "version": "1.0.0",
+            "name": DOMAIN_NAME,
+            "version": DOMAIN_VERSION,
             "chainId": str(self.chain_id),
             "verifyingContract": self.contract_address
         }
@@ -48,26 +128,49 @@ class SignatureService:
         }
         
         typed_data = {
-            "types": {
-                "EIP712Domain": [
-                    {"name": "name", "type": "string"},
-                    {"name": "version", "type": "string"},
-                    {"name": "chainId", "type": "uint256"},
-                    {"name": "verifyingContract", "type": "address"}
-                ],
-                "Legacy": [
-                    {"name": "legacyId", "type": "uint256"},
-                    {"name": "tokenType", "type": "uint8"},
-                    {"name": "tokenAddress", "type": "address"},
-                    {"name": "tokenId", "type": "uint256"},
-                    {"name": "amount", "type": "uint256"},
-                    {"name": "from", "type": "address"},
-                    {"name": "to", "type": "address"}
-                ]
-            },
+            "types": EIP712_TYPES,
             "primaryType": "Legacy",
             "domain": domain_data,
             "message": message_data
         }
         
         return typed_data
+
+    def get_digest(
+                    self,
+                    legacy_id: int,
+                    token_type: TokenType,
+                    token_address: str,
+                    token_id: int,
+                    amount: int,
+                    from_address: str = None,
+                    to_address: str = None) -> bytes:
+        """
+        EIP-712 digest of a Legacy message, hashed directly from the cached
+        domain separator and type hash instead of the typed data dict
+        """
+        struct_hash = keccak(
+            LEGACY_TYPEHASH
+            + _encode_uint(legacy_id)
+            + _encode_uint(token_type)
+            + _encode_address(token_address)
+            + _encode_uint(token_id)
+            + _encode_uint(amount)
+            + _encode_address(from_address)
+            + _encode_address(to_address)
+        )
+        return keccak(b"\x19\x01" + self.domain_separator + struct_hash)
+
+    def verify(self, signature: str, signer: str, *fields) -> bool:
+        """Whether `signer` produced `signature` over the Legacy message of `fields`"""
+        recovered = recover_signer(self.get_digest(*fields), signature)
+        return recovered is not None and recovered == to_checksum_address(signer)
+
+    @staticmethod
+    def verify_many(items: list[tuple], workers: int = None, chunk_size: int = 500) -> list[tuple[str, bool]]:
+        """Verify many signatures, see _verify_chunk for the item layout.
+        With `workers` > 1 up to that many chunks run at a time in the shared process pool"""
+        chunks = [(items[i:i + chunk_size],) for i in range(0, len(items), chunk_size)]
+        if len(chunks) <= 1:
+            workers = None
+        return [result for chunk in map_in_pool(_verify_chunk, chunks, workers) for result in chunk]
@@ -10,18 +10,20 @@ import json
 from app.models.legacy import Legacy
 from app.services.investment_wallet import InvestmentWalletService
 from app.services.wallet import WalletService
+from app.services.watcher import TransactionWatcher
+from app.utils.cache import AsyncLoadingCache
+from app.utils.guard import UpstreamGuard, GuardedTransport
+from app.services.checkpoint import JobCheckpoint
 from datetime import datetime, timezone
 import uuid
 
-timeouts = httpx.Timeout(
-    connect=10.0,
-    read=300.0,
-    write=60.0,
-    pool=10.0
-)
-
 load_dotenv()
 
+# StakeKit transaction statuses reached only after a signed transaction was submitted
+SUBMITTED_STAKEKIT_STATUSES = ("BROADCASTED", "PENDING", "CONFIRMED", "FAILED")
+# seconds to wait for a submitted StakeKit transaction to reach CONFIRMED or FAILED
+STAKEKIT_STATUS_TIMEOUT = float(os.getenv("STAKEKIT_STATUS_TIMEOUT", "900"))
+
 class StakeKitService:
     API_KEY = os.getenv("STAKEKIT_API_KEY")
     BASE_URL = os.getenv("STAKEKIT_BASE_URL")
@@ -38,28 +40,89 @@ class StakeKitService:
         pool=10.0
     )
 
+    LIMITS = httpx.Limits(
+        max_connections=int(os.getenv("STAKEKIT_POOL_SIZE", "20")),
+        max_keepalive_connections=int(os.getenv("STAKEKIT_POOL_SIZE", "20")),
+        keepalive_expiry=60.0
+    )
+
+    # requests per second to StakeKit across all workers of the host
+    GUARD = UpstreamGuard(
+        "stakekit",
+        rate=float(os.getenv("STAKEKIT_RATE_LIMIT", "10")),
+        burst=float(os.getenv("STAKEKIT_RATE_BURST", "20"))
+    )
+
+    _client: httpx.AsyncClient | None = None
+
+    # minimum amount, default validator and decimals rarely change
+    YIELD_CACHE = AsyncLoadingCache(
+        ttl=float(os.getenv("STAKEKIT_YIELD_TTL", "300")),
+        stale_ttl=float(os.getenv("STAKEKIT_YIELD_STALE_TTL", "3600")),
+        maxsize=64
+    )
+
+    # one gas quote per network, shared by concurrent and multi-transaction flows
+    GAS_CACHE = AsyncLoadingCache(
+        ttl=float(os.getenv("STAKEKIT_GAS_TTL", "10")),
+        stale_ttl=0,
+        maxsize=16
+    )
+
+    # pending actions running at once across all legacies of this worker
+    PENDING_ACTION_SLOTS = asyncio.Semaphore(int(os.getenv("STAKEKIT_PENDING_CONCURRENCY", "4")))
+
+    # StakeKit assigns the nonce when constructing, so one wallet constructs and submits one transaction at a time
+    _wallet_locks: dict[str, asyncio.Lock] = {}
+    GAS_MODE = os.getenv("STAKEKIT_GAS_MODE", "average")
+
+    @staticmethod
+    async def connect():
+        """Open the shared StakeKit client (called from the app lifespan)"""
+        if StakeKitService._client is None:
+            StakeKitService._client = httpx.AsyncClient(
+                base_url=StakeKitService.BASE_URL,
+                headers={"Accept": "application/json", "X-API-KEY": StakeKitService.API_KEY},
+                timeout=StakeKitService.TIMEOUTS,
+                # fails fast with a 503 while StakeKit is down instead of waiting out the read timeout
+                transport=GuardedTransport(StakeKitService.GUARD, limits=StakeKitService.LIMITS, http2=True)
+            )
+
+    @staticmethod
+    async def close():
+        if StakeKitService._client is not None:
+            await StakeKitService._client.aclose()
+            StakeKitService._client = None
+
+    @staticmethod
+    def client() -> httpx.AsyncClient:
+        if StakeKitService._client is None:
+            raise RuntimeError("StakeKit client is not connected, the app lifespan has not started")
+        return StakeKitService._client
+
 
     @staticmethod
     async def get_yield_info(integration_id: str):
+        """Get yield information for a specific integration, cached per integration id"""
+        return await StakeKitService.YIELD_CACHE.get(
+            integration_id,
+            lambda: StakeKitService.fetch_yield_info(integration_id)
+        )
+
+    @staticmethod
+    async def fetch_yield_info(integration_id: str):
         """Get yield information for a specific integration from StakeKit"""
         try:
-            async with httpx.AsyncClient(timeout=StakeKitService.TIMEOUTS) as session:
-                response = await session.get(
-                    f"{StakeKitService.BASE_URL}/yields/{integration_id}",
-                    headers={
-                        "Accept": "application/json",
-                        "X-API-KEY": StakeKitService.API_KEY
-                    }
+            response = await StakeKitService.client().get(f"/yields/{integration_id}")
+            
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Error getting yield information: {response.text}"
                 )
                 
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Error getting yield information: {response.text}"
-                    )
-                    
-                return response.json()
-                
+            return response.json()
+            
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=500,
@@ -84,7 +147,7 @@ class StakeKitService:
             raise HTTPException(status_code=400, detail=f"integration not defined for chain {chain_id} and token {token_address}")
 
     @staticmethod
-    async def post_action(session, wallet, legacy, api_action, log_action):
+    async def post_action(wallet, legacy, api_action, log_action):
         try:
             integration = StakeKitService.get_stakekit_integration_id(legacy.chain_id, legacy.token_address)
             integration_info = await StakeKitService.get_yield_info(integration["id"])
@@ -96,9 +159,8 @@ class StakeKitService:
             if amount < min_amount:
                 raise HTTPException(status_code=400, detail=f"Legacy amount is less than the minimum amount for {log_action}")
 
-            response = await session.post(
-                f"{StakeKitService.BASE_URL}/actions/{api_action}",
-                headers={"Content-Type": "application/json", "X-API-KEY": StakeKitService.API_KEY},
+            response = await StakeKitService.client().post(
+                f"/actions/{api_action}",
                 json={
                     "integrationId": integration["id"],
                     "addresses": {"address": wallet.address},
@@ -131,12 +193,14 @@ class StakeKitService:
             )
 
     @staticmethod
-    async def get_current_gas(session, log_action):
+    async def get_current_gas(network: str, log_action):
         try:
-            response = await session.get(
-                f"{StakeKitService.BASE_URL}/transactions/gas/ethereum",
-                headers={"Accept": "application/json", "X-API-KEY": StakeKitService.API_KEY},
-            )
+            response = await StakeKitService.client().get(f"/transactions/gas/{network}")
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Error getting gas for {log_action}: {response.text}"
+                )
             return response.json()
         except httpx.RequestError as e:
             raise HTTPException(
@@ -150,11 +214,25 @@ class StakeKitService:
             )
 
     @staticmethod
-    async def construct_transaction(session, log_action, partial_tx, gas_args):
+    async def get_gas_args(network: str, log_action, mode: str = None):
+        """Gas args for `mode` from a short-lived quote shared by every flow on the network"""
+        mode = mode or StakeKitService.GAS_MODE
+        gas_response = await StakeKitService.GAS_CACHE.get(
+            network,
+            lambda: StakeKitService.get_current_gas(network, log_action)
+        )
+        values = gas_response["modes"]["values"]
+        for value in values:
+            if value.get("name") == mode:
+                return value["gasArgs"]
+        # StakeKit lists slow, average, fast
+        return values[min(1, len(values) - 1)]["gasArgs"]
+
+    @staticmethod
+    async def construct_transaction(log_action, partial_tx, gas_args):
         try:
-            response = await session.patch(
-                f"{StakeKitService.BASE_URL}/transactions/{partial_tx['id']}",
-                headers={"Accept": "application/json", "X-API-KEY": StakeKitService.API_KEY},
+            response = await StakeKitService.client().patch(
+                f"/transactions/{partial_tx['id']}",
                 json={"gasArgs": gas_args},
             )
             return response.json()
@@ -170,11 +248,10 @@ class StakeKitService:
             )
 
     @staticmethod
-    async def submit_transaction(session, log_action, partial_tx, signed_tx_hex):
+    async def submit_transaction(log_action, partial_tx, signed_tx_hex):
         try:
-            await session.post(
-                f"{StakeKitService.BASE_URL}/transactions/{partial_tx['id']}/submit",
-                headers={"Accept": "application/json", "X-API-KEY": StakeKitService.API_KEY},
+            await StakeKitService.client().post(
+                f"/transactions/{partial_tx['id']}/submit",
                 json={"signedTransaction": signed_tx_hex},
             )
         except httpx.RequestError as e:
@@ -189,12 +266,9 @@ class StakeKitService:
             )
 
     @staticmethod
-    async def get_transaction_status(session, log_action, partial_tx):
+    async def get_transaction_status(log_action, partial_tx):
         try:
-            response = await session.get(
-                f"{StakeKitService.BASE_URL}/transactions/{partial_tx['id']}/status",
-                headers={"Accept": "application/json", "X-API-KEY": StakeKitService.API_KEY},
-            )
+            response = await StakeKitService.client().get(f"/transactions/{partial_tx['id']}/status")
             return response.json()
         except httpx.RequestError as e:
             raise HTTPException(
@@ -208,14 +282,30 @@ class StakeKitService:
             )
 
     @staticmethod
-    async def execute_transaction_flow(session, wallet, log_action, transactions):
+    async def get_checked_transaction_status(log_action, partial_tx):
+        status_response = await StakeKitService.get_transaction_status(log_action, partial_tx)
+        if not status_response or "status" not in status_response:
+            raise HTTPException(
+                status_code=500,
+                detail=f"StakeKit API did not return a valid transaction status. Response: {status_response}"
+            )
+        return status_response
+
+    @staticmethod
+    async def execute_transaction_flow(
+        wallet, log_action, transactions, network: str, checkpoint: JobCheckpoint = None, scope: str = None,
+        resumed: bool = False
+    ):
         """ Handles the complete transaction flow:
         1. Gas estimation.
         2. Transaction construction.
         3. Signing and submitting the transaction.
         4. Status verification.
+        With a checkpoint, every submitted transaction is recorded under `scope`
+        and a resumed flow only waits for it instead of submitting it again.
         """
         w3 = Web3()
+        submitted = list(checkpoint.get(f"{scope}:submitted", [])) if checkpoint else []
 
         for i, partial_tx in enumerate(transactions):
             if partial_tx["status"] == "SKIPPED":
@@ -223,67 +313,83 @@ class StakeKitService:
 
             print(f"Action {i + 1} out of {len(transactions)}: {partial_tx['type']}")
 
-            gas_response = await StakeKitService.get_current_gas(session, log_action)
-            constructed_transaction_response = await StakeKitService.construct_transaction(
-                session, log_action, partial_tx, gas_response["modes"]["values"][1]["gasArgs"]
-            )
+            if resumed and partial_tx["id"] not in submitted:
+                # the previous worker may have stopped between submitting and saving the checkpoint
+                status_response = await StakeKitService.get_transaction_status(log_action, partial_tx)
+                if (status_response or {}).get("status") in SUBMITTED_STAKEKIT_STATUSES:
+                    submitted.append(partial_tx["id"])
+
+            if partial_tx["id"] not in submitted:
+                async with StakeKitService._wallet_locks.setdefault(wallet.address, asyncio.Lock()):
+                    await StakeKitService.sign_and_submit(w3, wallet, log_action, partial_tx, network)
+                submitted.append(partial_tx["id"])
+                if checkpoint:
+                    await checkpoint.save(f"{scope}:submitted", submitted)
 
+            # Verify transaction status, polled together with every other pending transaction
             try:
-                unsigned_transaction = constructed_transaction_response["unsignedTransaction"]
-                unsigned_data = json.loads(unsigned_transaction)
-                transaction_data = {
-                    "from": Web3.to_checksum_address(unsigned_data["from"]),
-                    "gas": int(unsigned_data["gasLimit"], 16),
-                    "to": Web3.to_checksum_address(unsigned_data["to"]),
-                    "data": unsigned_data["data"],
-                    "nonce": unsigned_data["nonce"],
-                    "type": unsigned_data["type"],
-                    "maxFeePerGas": int(unsigned_data["maxFeePerGas"], 16),
-                    "maxPriorityFeePerGas": int(unsigned_data["maxPriorityFeePerGas"], 16),
-                    "chainId": unsigned_data["chainId"]
-                }
-                signed_tx = w3.eth.account.sign_transaction(transaction_data, wallet.key)
-            except json.JSONDecodeError as e:
+                status_response = await TransactionWatcher.wait_for_stakekit_status(
+                    partial_tx["id"],
+                    lambda: StakeKitService.get_checked_transaction_status(log_action, partial_tx),
+                    timeout=STAKEKIT_STATUS_TIMEOUT
+                )
+            except asyncio.TimeoutError:
                 raise HTTPException(
                     status_code=500,
-                    detail=f"Error parsing transaction JSON: {str(e)}"
+                    detail=f"No final status for transaction {partial_tx['id']} after {STAKEKIT_STATUS_TIMEOUT}s"
                 )
+            if status_response["status"] == "CONFIRMED":
+                print(status_response["url"])
+            else:
+                print("TRANSACTION FAILED")
 
-            signed_tx_hex = "0x" + signed_tx.raw_transaction.hex()
-            await StakeKitService.submit_transaction(session, log_action, partial_tx, signed_tx_hex)
+        return {"status": f"{log_action} successfully executed"}
 
-            # Verify transaction status
-            while True:
-                status_response = await StakeKitService.get_transaction_status(session, log_action, partial_tx)
-                if not status_response or "status" not in status_response:
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"StakeKit API did not return a valid transaction status. Response: {status_response}"
-                    )
-                    
-                status = status_response["status"]
-                if status == "CONFIRMED":
-                    print(status_response["url"])
-                    break
-                elif status == "FAILED":
-                    print("TRANSACTION FAILED")
-                    break
-                else:
-                    print("Pending...")
-                    await asyncio.sleep(1)
+    @staticmethod
+    async def sign_and_submit(w3, wallet, log_action, partial_tx, network: str):
+        """Constructs a partial transaction with current gas, signs it with the wallet and submits it"""
+        gas_args = await StakeKitService.get_gas_args(partial_tx.get("network") or network, log_action)
+        constructed_transaction_response = await StakeKitService.construct_transaction(
+            log_action, partial_tx, gas_args
+        )
 
-        return {"status": f"{log_action} successfully executed"}
+        try:
+            unsigned_transaction = constructed_transaction_response["unsignedTransaction"]
+            unsigned_data = json.loads(unsigned_transaction)
+            transaction_data = {
+                "from": Web3.to_checksum_address(unsigned_data["from"]),
+                "gas": int(unsigned_data["gasLimit"], 16),
+                "to": Web3.to_checksum_address(unsigned_data["to"]),
+                "data": unsigned_data["data"],
+                "nonce": unsigned_data["nonce"],
+                "type": unsigned_data["type"],
+                "maxFeePerGas": int(unsigned_data["maxFeePerGas"], 16),
+                "maxPriorityFeePerGas": int(unsigned_data["maxPriorityFeePerGas"], 16),
+                "chainId": unsigned_data["chainId"]
+            }
+            signed_tx = w3.eth.account.sign_transaction(transaction_data, wallet.key)
+        except json.JSONDecodeError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error parsing transaction JSON: {str(e)}"
+            )
+
+        signed_tx_hex = "0x" + signed_tx.raw_transaction.hex()
+        await StakeKitService.submit_transaction(log_action, partial_tx, signed_tx_hex)
 
     @staticmethod
-    async def perform_staking_action(legacy: Legacy, api_action: str):
+    async def perform_staking_action(legacy: Legacy, api_action: str, checkpoint: JobCheckpoint = None):
         """Executes staking or unstaking in StakeKit."""
+        log_action = "stake" if api_action == "enter" else "unstake"
         try:
             investment_wallet = await InvestmentWalletService.get_investment_wallet(legacy.id)
             wallet = WalletService.get_wallet_from_index(investment_wallet.index)
-            log_action = "stake" if api_action == "enter" else "unstake"
 
-            async with httpx.AsyncClient(timeout=timeouts) as session:
-                stake_session_response = await StakeKitService.post_action(session, wallet, legacy, api_action, log_action)
+            # a resumed job reuses the transactions of the action it already created
+            transactions = checkpoint.get(f"{api_action}:transactions") if checkpoint else None
+            resumed = transactions is not None
+            if not resumed:
+                stake_session_response = await StakeKitService.post_action(wallet, legacy, api_action, log_action)
                 print("StakeKit Response:", stake_session_response)
 
                 if "transactions" not in stake_session_response:
@@ -291,13 +397,18 @@ class StakeKitService:
                         status_code=400, detail=f"Failed to create transaction for {log_action}"
                     )
 
-                return await StakeKitService.execute_transaction_flow(
-                    session, wallet, log_action, stake_session_response["transactions"]
-                )
+                transactions = stake_session_response["transactions"]
+                if checkpoint:
+                    await checkpoint.save(f"{api_action}:transactions", transactions)
+
+            return await StakeKitService.execute_transaction_flow(
+                wallet, log_action, transactions, Chain.get_stakekit_network(legacy.chain_id),
+                checkpoint, api_action, resumed
+            )
         except HTTPException as e:
             raise e
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error executing {log_action}: {str(e.with_traceback())}")
+            raise HTTPException(status_code=500, detail=f"Error executing {log_action}: {str(e)}")
 
     @staticmethod
     async def get_stake_balance(legacy: Legacy):
@@ -311,26 +422,24 @@ class StakeKitService:
             integrationInfo = await StakeKitService.get_yield_info(integration["id"])
             validatorAddress = integrationInfo["metadata"]["defaultValidator"]
             # Create the request
-            async with httpx.AsyncClient() as session:
-                response = await session.post(
-                    f"{StakeKitService.BASE_URL}/yields/{integration['id']}/balances",
-                    headers={"Content-Type": "application/json", "X-API-KEY": StakeKitService.API_KEY},
-                    json={
-                        "addresses": {"address": wallet.address},
-                        "args": {"validatorAddresses": [validatorAddress]}
-                        }
-                )
+            response = await StakeKitService.client().post(
+                f"/yields/{integration['id']}/balances",
+                json={
+                    "addresses": {"address": wallet.address},
+                    "args": {"validatorAddresses": [validatorAddress]}
+                    }
+            )
 
-                # Verify if the response is successful
-                if response.status_code != 201:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Error getting stake balance: {response.text}"
-                    )
+            # Verify if the response is successful
+            if response.status_code != 201:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Error getting stake balance: {response.text}"
+                )
 
-                balance_data = response.json()
-                print(balance_data)
-                return balance_data  # Returns all balance information
+            balance_data = response.json()
+            print(balance_data)
+            return balance_data  # Returns all balance information
 
         except httpx.RequestError as e:
             raise HTTPException(
@@ -343,6 +452,46 @@ class StakeKitService:
                 detail=f"Internal service error: {str(e)}"
             )
 
+    @staticmethod
+    async def get_stake_balances(integration_id: str, addresses: list[str]) -> list[list]:
+        """Retrieves the staking balances of many addresses of one integration in a single call,
+        returned in the order of `addresses`."""
+        try:
+            integration_info = await StakeKitService.get_yield_info(integration_id)
+            validator_address = integration_info["metadata"]["defaultValidator"]
+            response = await StakeKitService.client().post(
+                "/yields/balances",
+                json=[
+                    {
+                        "integrationId": integration_id,
+                        "addresses": {"address": address},
+                        "args": {"validatorAddresses": [validator_address]}
+                    }
+                    for address in addresses
+                ]
+            )
+
+            if response.status_code not in (200, 201):
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Error getting stake balances: {response.text}"
+                )
+
+            # one entry per requested address, in request order
+            entries = response.json()
+            if len(entries) != len(addresses):
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"StakeKit returned {len(entries)} balances for {len(addresses)} addresses"
+                )
+            return [entry.get("balances", []) for entry in entries]
+
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error connecting to StakeKit balance API: {str(e)}"
+            )
+
     @staticmethod
     def format_balance_data(balance_data):
         formatted_data = []
@@ -359,7 +508,7 @@ class StakeKitService:
         return formatted_data
 
     @staticmethod
-    async def post_pending_action(session, integration_id: str, entry, action):
+    async def post_pending_action(integration_id: str, entry, action):
         """Executes a pending action in StakeKit."""
         try:
             amount = entry.get("amount")
@@ -367,9 +516,8 @@ class StakeKitService:
             action_type = action.get("type")
             passthrough = action.get("passthrough")
 
-            response = await session.post(
-                f"{StakeKitService.BASE_URL}/actions/pending",
-                headers={"Content-Type": "application/json", "X-API-KEY": StakeKitService.API_KEY},
+            response = await StakeKitService.client().post(
+                "/actions/pending",
                 json={
                     "type": action_type,
                     "integrationId": integration_id,
@@ -383,52 +531,97 @@ class StakeKitService:
             raise HTTPException(status_code=500, detail=f"Error connecting to StakeKit: {str(e)}")
    
     @staticmethod
-    async def perform_pending_actions(legacy: Legacy):
+    async def perform_pending_actions(legacy: Legacy, checkpoint: JobCheckpoint = None):
         """Executes all pending actions in StakeKit."""
         try:
             investment_wallet = await InvestmentWalletService.get_investment_wallet(legacy.id)
             wallet = WalletService.get_wallet_from_index(investment_wallet.index)
 
-            async with httpx.AsyncClient(timeout=timeouts) as session:
-                results = []
-                integration = StakeKitService.get_stakekit_integration_id(legacy.chain_id, legacy.token_address)
-                stake_balance = await StakeKitService.get_stake_balance(legacy)
+            integration = StakeKitService.get_stakekit_integration_id(legacy.chain_id, legacy.token_address)
 
-                executable_entries = [
-                    entry for entry in stake_balance
+            # the planned actions are kept so a resumed job does not re-read a half-processed balance
+            planned = checkpoint.get("pending:actions") if checkpoint else None
+            if planned is None:
+                stake_balance = await StakeKitService.get_stake_balance(legacy)
+                planned = [
+                    {"groupId": entry.get("groupId"), "entry": entry, "action": action}
+                    for entry in stake_balance
                     if "pendingActions" in entry and entry["pendingActions"]  # Checks if there are pending actions
+                    for action in entry["pendingActions"]
                 ]
-                for entry in executable_entries:
-                    groupId = entry.get("groupId")
-                    pending_actions = entry.get("pendingActions", [])
-                    for action in pending_actions:
-                        action_type = action.get("type")
+                if checkpoint:
+                    await checkpoint.save("pending:actions", planned)
+
+            # StakeKit sets the nonce when a transaction is constructed, so an action constructs its
+            # transactions only once the previous one's are confirmed (a claim before the restake
+            # depending on it). Only the action creation calls overlap
+            finished = [asyncio.Event() for _ in planned]
+
+            async def run_pending_action(i, item):
+                try:
+                    return await submit_pending_action(i, item)
+                finally:
+                    # a failed or already finished action does not hold back the ones after it
+                    finished[i].set()
+
+            async def submit_pending_action(i, item):
+                groupId = item["groupId"]
+                scope = f"pending:{i}"
+                response = checkpoint.get(f"{scope}:result") if checkpoint else None
+                if response is not None:
+                    return {groupId: response}
+
+                action_type = item["action"].get("type")
+                transactions = checkpoint.get(f"{scope}:transactions") if checkpoint else None
+                resumed = transactions is not None
+                if not resumed:
+                    async with StakeKitService.PENDING_ACTION_SLOTS:
                         # Execute the pending action
                         pending_response = await StakeKitService.post_pending_action(
-                            session, integration["id"], entry, action
+                            integration["id"], item["entry"], item["action"]
                         )
-                        print(f"Pending Action Response ({groupId}):", pending_response)
-
-                        if "transactions" not in pending_response:
-                            raise HTTPException(
-                                status_code=400, detail=f"Failed to create transaction for {action_type}"
-                            )
+                    print(f"Pending Action Response ({groupId}):", pending_response)
 
-                        response = await StakeKitService.execute_transaction_flow(
-                            session, wallet, action_type, pending_response["transactions"]
+                    if "transactions" not in pending_response:
+                        raise HTTPException(
+                            status_code=400, detail=f"Failed to create transaction for {action_type}"
                         )
-                        results.append({groupId: response})
-                return results
+
+                    transactions = pending_response["transactions"]
+                    if checkpoint:
+                        await checkpoint.save(f"{scope}:transactions", transactions)
+
+                # the slot is taken after the turn, a waiting action never holds one
+                if i:
+                    await finished[i - 1].wait()
+                async with StakeKitService.PENDING_ACTION_SLOTS:
+                    response = await StakeKitService.execute_transaction_flow(
+                        wallet, action_type, transactions, Chain.get_stakekit_network(legacy.chain_id),
+                        checkpoint, scope, resumed
+                    )
+                if checkpoint:
+                    await checkpoint.save(f"{scope}:result", response)
+                return {groupId: response}
+
+            # every action runs to completion (and checkpoints) before the first error is raised
+            results = await asyncio.gather(
+                *(run_pending_action(i, item) for i, item in enumerate(planned)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            return results
         except HTTPException as e:
             raise e
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error executing pending actions: {str(e)}")
     
     @staticmethod
-    async def withdraw(legacy: Legacy):
+    async def withdraw(legacy: Legacy, checkpoint: JobCheckpoint = None):
         """Executes the process of withdrawing all available funds in StakeKit."""
 
-        results = await StakeKitService.perform_pending_actions(legacy)
+        results = await StakeKitService.perform_pending_actions(legacy, checkpoint)
         if not results:
             return {"status": "Nothing to withdraw"}
         return results
\ No newline at end of file
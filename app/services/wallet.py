@@ -1,13 +1,135 @@
 import os
-from web3 import Web3
+import asyncio
+import hashlib
+import hmac
+from functools import lru_cache
+from typing import Iterator
+from web3 import Web3, AsyncWeb3
 from fastapi import HTTPException
 from dotenv import load_dotenv
 from eth_account import Account
-from app.models.investment_wallet import InvestmentWallet
-from web3 import Web3
+from eth_account.hdaccount import seed_from_mnemonic
+from eth_account.hdaccount.deterministic import Node, SoftNode, derive_child_key
+from eth_keys import keys
+from app.config.rpc import get_web3, get_async_web3
+from app.config.process_pool import map_in_pool
+from app.repositories.token_metadata import TokenMetadataRepository
 
 load_dotenv()
 
+# investment wallets live at m/44'/60'/0'/0/{index}
+HD_PARENT_PATH = "m/44'/60'/0'/0"
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+MULTICALL3_ADDRESS = Web3.to_checksum_address(os.getenv("MULTICALL3_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11"))
+MULTICALL_BATCH_SIZE = 500
+NATIVE_TOKEN_ADDRESS = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+
+# ERC20 ABI - only functions we need
+ERC20_ABI = [
+    {
+        "constant": True,
+        "inputs": [{"name": "_owner", "type": "address"}],
+        "name": "balanceOf",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "decimals",
+        "outputs": [{"name": "", "type": "uint8"}],
+        "type": "function"
+    },
+    {
+        "constant": True,
+        "inputs": [],
+        "name": "symbol",
+        "outputs": [{"name": "", "type": "string"}],
+        "type": "function"
+    }
+]
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [{
+            "components": [
+                {"name": "target", "type": "address"},
+                {"name": "allowFailure", "type": "bool"},
+                {"name": "callData", "type": "bytes"}
+            ],
+            "name": "calls",
+            "type": "tuple[]"
+        }],
+        "name": "aggregate3",
+        "outputs": [{
+            "components": [
+                {"name": "success", "type": "bool"},
+                {"name": "returnData", "type": "bytes"}
+            ],
+            "name": "returnData",
+            "type": "tuple[]"
+        }],
+        "stateMutability": "payable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+# in-memory front of the token_metadata table
+_token_metadata: dict[tuple[int, str], dict] = {}
+
+async def _multicall(w3: AsyncWeb3, calls: list[tuple[str, str]]) -> list[tuple[bool, bytes]]:
+    """Run (target, calldata) calls through Multicall3, one eth_call per batch"""
+    multicall = w3.eth.contract(address=MULTICALL3_ADDRESS, abi=MULTICALL3_ABI)
+    batches = await asyncio.gather(*[
+        multicall.functions.aggregate3([
+            (target, True, data) for target, data in calls[i:i + MULTICALL_BATCH_SIZE]
+        ]).call()
+        for i in range(0, len(calls), MULTICALL_BATCH_SIZE)
+    ])
+    return [result for batch in batches for result in batch]
+
+@lru_cache(maxsize=4)
+def _get_hd_parent(mnemonic: str) -> tuple[bytes, bytes, bytes]:
+    """Stretch the mnemonic and walk the parent path once per process.
+    Returns the parent private key, chain code and compressed public key"""
+    seed = seed_from_mnemonic(mnemonic, "")
+    main_node = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+    key, chain_code = main_node[:32], main_node[32:]
+    for node in HD_PARENT_PATH.split("/")[1:]:
+        key, chain_code = derive_child_key(key, chain_code, Node.decode(node))
+    return key, chain_code, keys.PrivateKey(key).public_key.to_compressed_bytes()
+
+def _derive_child_key(parent: tuple[bytes, bytes, bytes], index: int) -> bytes:
+    """BIP-32 soft child derivation reusing the parent's precomputed public key"""
+    key, chain_code, public_key = parent
+    child = hmac.new(chain_code, public_key + index.to_bytes(4, "big"), hashlib.sha512).digest()
+    tweak = int.from_bytes(child[:32], "big")
+    child_key = (tweak + int.from_bytes(key, "big")) % SECP256K1_N
+    if tweak >= SECP256K1_N or child_key == 0:
+        # invalid child (< 2**-127 probability), let eth_account apply the BIP-32 rule
+        return derive_child_key(key, chain_code, SoftNode(index))[0]
+    return child_key.to_bytes(32, "big")
+
+@lru_cache(maxsize=int(os.getenv("WALLET_ACCOUNT_CACHE_SIZE", "1024")))
+def _derive_account(mnemonic: str, index: int):
+    return Account.from_key(_derive_child_key(_get_hd_parent(mnemonic), index))
+
+def _derive_address_range(mnemonic: str, start: int, stop: int) -> list[tuple[int, str]]:
+    """Derive the addresses of [start, stop) from the shared parent node (runs in pool workers too)"""
+    parent = _get_hd_parent(mnemonic)
+    return [
+        (index, keys.PrivateKey(_derive_child_key(parent, index)).public_key.to_checksum_address())
+        for index in range(start, stop)
+    ]
+
 class WalletService:
     """Service for wallet operations"""
     
@@ -37,8 +159,6 @@ class WalletService:
     def get_wallet_from_mnemonic(mnemonic: str = None):
         """Get a wallet from a mnemonic phrase or from environment variable"""
         try:
-            w3 = Web3()
-            
             # Use provided mnemonic or get from environment
             if not mnemonic:
                 mnemonic = os.getenv("WALLET_MNEMONIC_PHRASE")
@@ -46,8 +166,7 @@ class WalletService:
             if not mnemonic:
                 raise ValueError("No mnemonic provided and WALLET_MNEMONIC_PHRASE not set")
                 
-            account = w3.eth.account.from_mnemonic(mnemonic)
-            return account
+            return _derive_account(mnemonic, 0)
             
         except Exception as e:
             raise HTTPException(
@@ -65,8 +184,6 @@ class WalletService:
             if index >= 2**31:
                 raise ValueError("Index must be less than 2^31")
                 
-            w3 = Web3()
-            
             # Use provided mnemonic or get from environment
             if not mnemonic:
                 mnemonic = os.getenv("WALLET_MNEMONIC_PHRASE")
@@ -74,18 +191,8 @@ class WalletService:
             if not mnemonic:
                 raise ValueError("No mnemonic provided and WALLET_MNEMONIC_PHRASE not set")
             
-            # Generate HD path for the specified index
-            # m/44'/60'/0'/0/{index}
-            account_path = f"m/44'/60'/0'/0/{index}"
-            
-            Account.enable_unaudited_hdwallet_features()
-            # Derive account from mnemonic and path
-            account = w3.eth.account.from_mnemonic(
-                mnemonic,
-                account_path=account_path
-            )
-            
-            return account
+            # Derive m/44'/60'/0'/0/{index} from the cached parent node
+            return _derive_account(mnemonic, index)
             
         except Exception as e:
             raise HTTPException(
@@ -93,15 +200,31 @@ class WalletService:
                 detail=f"Error creating wallet from index {index}: {str(e)}"
             )
 
+    @staticmethod
+    def derive_addresses(start: int, count: int, mnemonic: str = None, workers: int = None, chunk_size: int = 500) -> Iterator[tuple[int, str]]:
+        """Yield (index, address) for `count` indexes from `start`, in order.
+        With `workers` > 1 up to that many chunks are derived at a time in the shared process pool"""
+        if start < 0 or start + count > 2**31:
+            raise ValueError("Indexes must be between 0 and 2^31")
+
+        if not mnemonic:
+            mnemonic = os.getenv("WALLET_MNEMONIC_PHRASE")
+
+        if not mnemonic:
+            raise ValueError("No mnemonic provided and WALLET_MNEMONIC_PHRASE not set")
+
+        chunks = [
+            (mnemonic, chunk_start, min(chunk_start + chunk_size, start + count))
+            for chunk_start in range(start, start + count, chunk_size)
+        ]
+        for chunk in map_in_pool(_derive_address_range, chunks, workers):
+            yield from chunk
+
     @staticmethod
     def get_balance(address: str, chain_id: int):
         """Get balance for a wallet address on a specific chain"""
         try:
-            web3_url = os.getenv(f"WEB3_URL_{chain_id}")
-            if not web3_url:
-                raise ValueError(f"No web3 URL configured for chain ID {chain_id}")
-                
-            w3 = Web3(Web3.HTTPProvider(web3_url))
+            w3 = get_web3(chain_id)
             balance_wei = w3.eth.get_balance(address)
             balance_eth = w3.from_wei(balance_wei, 'ether')
             
@@ -119,71 +242,92 @@ class WalletService:
             )
     
     @staticmethod
-    def get_token_balance(address: str, token_address: str, chain_id: int):
+    async def get_token_balance(address: str, token_address: str, chain_id: int):
         """Get token balance for a wallet address on a specific chain"""
+        balances = await WalletService.get_token_balances(chain_id, [(address, token_address)])
+        return balances[0]
+
+    @staticmethod
+    async def get_token_metadata(chain_id: int, token_addresses: list[str]) -> dict[str, dict]:
+        """Get symbol and decimals per token, from memory, then the token_metadata table, then the chain"""
+        missing = [token for token in token_addresses if (chain_id, token) not in _token_metadata]
+        if missing:
+            for row in await TokenMetadataRepository.get_many(chain_id, missing):
+                _token_metadata[(chain_id, row["token_address"])] = row
+            missing = [token for token in missing if (chain_id, token) not in _token_metadata]
+
+        if missing:
+            w3 = get_async_web3(chain_id)
+            erc20 = w3.eth.contract(abi=ERC20_ABI)
+            erc20_tokens = [token for token in missing if token != NATIVE_TOKEN_ADDRESS]
+            results = await _multicall(w3, [
+                call
+                for token in erc20_tokens
+                for call in ((token, erc20.encode_abi("decimals")), (token, erc20.encode_abi("symbol")))
+            ])
+
+            rows = [{"chain_id": chain_id, "token_address": NATIVE_TOKEN_ADDRESS, "symbol": "NATIVE", "decimals": 18}] if NATIVE_TOKEN_ADDRESS in missing else []
+            for i, token in enumerate(erc20_tokens):
+                (decimals_ok, decimals_data), (symbol_ok, symbol_data) = results[2 * i], results[2 * i + 1]
+                try:
+                    rows.append({
+                        "chain_id": chain_id,
+                        "token_address": token,
+                        "decimals": w3.codec.decode(["uint8"], decimals_data)[0],
+                        "symbol": w3.codec.decode(["string"], symbol_data)[0]
+                    })
+                except Exception:
+                    # left uncached so a transient failure is retried on the next call
+                    continue
+
+            if rows:
+                await TokenMetadataRepository.upsert_many(rows)
+            for row in rows:
+                _token_metadata[(chain_id, row["token_address"])] = row
+
+        return {
+            token: _token_metadata.get((chain_id, token), {"symbol": "UNKNOWN", "decimals": 18})
+            for token in token_addresses
+        }
+
+    @staticmethod
+    async def get_token_balances(chain_id: int, items: list[tuple[str, str]]):
+        """Get token balances for many (address, token_address) pairs with Multicall3 round trips"""
         try:
-            web3_url = os.getenv(f"WEB3_URL_{chain_id}")
-            if not web3_url:
-                raise ValueError(f"No web3 URL configured for chain ID {chain_id}")
-                
-            w3 = Web3(Web3.HTTPProvider(web3_url))
-            
-            # ERC20 ABI - only functions we need
-            abi = [
-                {
-                    "constant": True,
-                    "inputs": [{"name": "_owner", "type": "address"}],
-                    "name": "balanceOf",
-                    "outputs": [{"name": "balance", "type": "uint256"}],
-                    "type": "function"
-                },
-                {
-                    "constant": True,
-                    "inputs": [],
-                    "name": "decimals",
-                    "outputs": [{"name": "", "type": "uint8"}],
-                    "type": "function"
-                },
-                {
-                    "constant": True,
-                    "inputs": [],
-                    "name": "symbol",
-                    "outputs": [{"name": "", "type": "string"}],
-                    "type": "function"
-                }
+            items = [
+                (Web3.to_checksum_address(address), Web3.to_checksum_address(token_address))
+                for address, token_address in items
             ]
-            
-            # Create contract instance
-            token_contract = w3.eth.contract(address=token_address, abi=abi)
-            
-            # Get token balance
-            balance_wei = token_contract.functions.balanceOf(address).call()
-            
-            # Get token decimals
-            try:
-                decimals = token_contract.functions.decimals().call()
-            except:
-                decimals = 18  # Default to 18 if decimals function fails
-                
-            # Get token symbol
-            try:
-                symbol = token_contract.functions.symbol().call()
-            except:
-                symbol = "UNKNOWN"  # Default if symbol function fails
-                
-            # Calculate balance in token units
-            balance_token = balance_wei / (10 ** decimals)
-            
-            return {
-                "address": address,
-                "token_address": token_address,
-                "chain_id": chain_id,
-                "symbol": symbol,
-                "decimals": decimals,
-                "balance_wei": str(balance_wei),
-                "balance_token": str(balance_token)
-            }
-            
+            metadata = await WalletService.get_token_metadata(chain_id, list(dict.fromkeys(token for _, token in items)))
+
+            w3 = get_async_web3(chain_id)
+            erc20 = w3.eth.contract(abi=ERC20_ABI)
+            multicall = w3.eth.contract(abi=MULTICALL3_ABI)
+            results = await _multicall(w3, [
+                (MULTICALL3_ADDRESS, multicall.encode_abi("getEthBalance", args=[address]))
+                if token == NATIVE_TOKEN_ADDRESS
+                else (token, erc20.encode_abi("balanceOf", args=[address]))
+                for address, token in items
+            ])
+
+            balances = []
+            for (address, token), (success, data) in zip(items, results):
+                if not success:
+                    raise ValueError(f"balance call failed for {address} on token {token}")
+
+                balance_wei = w3.codec.decode(["uint256"], data)[0]
+                decimals = metadata[token]["decimals"]
+                balances.append({
+                    "address": address,
+                    "token_address": token,
+                    "chain_id": chain_id,
+                    "symbol": metadata[token]["symbol"],
+                    "decimals": decimals,
+                    "balance_wei": str(balance_wei),
+                    "balance_token": str(balance_wei / (10 ** decimals))
+                })
+            return balances
+
         except Exception as e:
             raise HTTPException(
                 status_code=500,
@@ -0,0 +1,165 @@
+from app.config.rpc import get_async_web3
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable
+import asyncio
+import contextvars
+import os
+import time
+
+load_dotenv()
+
+POLL_INTERVAL = float(os.getenv("WATCHER_POLL_INTERVAL", "2"))
+MAX_BACKOFF = float(os.getenv("WATCHER_MAX_BACKOFF", "15"))
+BACKOFF_FACTOR = 1.5
+RECEIPT_BATCH_SIZE = 100
+STATUS_CONCURRENCY = 10
+FINAL_STAKEKIT_STATUSES = ("CONFIRMED", "FAILED")
+
+class _StakeKitEntry:
+    def __init__(self, fetch_status: Callable[[], Awaitable[dict]]):
+        self.fetch_status = fetch_status
+        self.futures: list[asyncio.Future] = []
+        self.interval = POLL_INTERVAL
+        self.next_check = time.monotonic() + POLL_INTERVAL
+
+class TransactionWatcher:
+    """Process-wide watcher for pending transactions.
+
+    On-chain transactions are checked with one loop per chain: every new block
+    triggers a single JSON-RPC batch of eth_getTransactionReceipt for all
+    registered hashes. StakeKit transactions share one loop that checks each
+    id with its own exponential backoff. Callers just await the result."""
+
+    _receipts: dict[int, dict[str, list[asyncio.Future]]] = {}
+    _stakekit: dict[str, _StakeKitEntry] = {}
+    _loops: dict[Any, asyncio.Task] = {}
+
+    @staticmethod
+    def _ensure_loop(key: Any, factory: Callable[[], Awaitable[None]]):
+        task = TransactionWatcher._loops.get(key)
+        if task is None or task.done():
+            # a fresh context, so the long-lived loop does not keep the caller's identity map alive
+            task = asyncio.create_task(factory(), context=contextvars.Context())
+            task.add_done_callback(lambda task: TransactionWatcher._loop_done(key, task))
+            TransactionWatcher._loops[key] = task
+
+    @staticmethod
+    def _loop_done(key: Any, task: asyncio.Task):
+        """Fail the waiters of a loop that crashed, they would otherwise hang until the next registration"""
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        print(f"watcher loop {key} stopped: {str(error)}")
+        if key == "stakekit":
+            futures = [future for entry in TransactionWatcher._stakekit.values() for future in entry.futures]
+        else:
+            futures = [future for futures in TransactionWatcher._receipts.get(key[1], {}).values() for future in futures]
+        TransactionWatcher._resolve(futures, error=error)
+
+    @staticmethod
+    async def wait_for_receipt(chain_id: int, tx_hash: str, timeout: float = None):
+        """Wait until `tx_hash` is mined on `chain_id` and return its receipt"""
+        tx_hash = tx_hash.lower()
+        future = asyncio.get_running_loop().create_future()
+        pending = TransactionWatcher._receipts.setdefault(chain_id, {})
+        pending.setdefault(tx_hash, []).append(future)
+        TransactionWatcher._ensure_loop(("chain", chain_id), lambda: TransactionWatcher._watch_chain(chain_id))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            futures = pending.get(tx_hash, [])
+            if future in futures:
+                futures.remove(future)
+            if not futures:
+                pending.pop(tx_hash, None)
+
+    @staticmethod
+    async def wait_for_stakekit_status(tx_id: str, fetch_status: Callable[[], Awaitable[dict]], timeout: float = None) -> dict:
+        """Wait until the StakeKit transaction `tx_id` is CONFIRMED or FAILED and return the status response"""
+        future = asyncio.get_running_loop().create_future()
+        entry = TransactionWatcher._stakekit.setdefault(tx_id, _StakeKitEntry(fetch_status))
+        entry.futures.append(future)
+        TransactionWatcher._ensure_loop("stakekit", TransactionWatcher._watch_stakekit)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if future in entry.futures:
+                entry.futures.remove(future)
+            if not entry.futures and TransactionWatcher._stakekit.get(tx_id) is entry:
+                del TransactionWatcher._stakekit[tx_id]
+
+    @staticmethod
+    def _resolve(futures: list[asyncio.Future], result: Any = None, error: Exception = None):
+        for future in futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    async def _watch_chain(chain_id: int):
+        w3 = get_async_web3(chain_id)
+        pending = TransactionWatcher._receipts[chain_id]
+        last_block = None
+        delay = POLL_INTERVAL
+
+        while pending:
+            try:
+                block = await w3.eth.block_number
+                if block != last_block:
+                    hashes = list(pending)
+                    for i in range(0, len(hashes), RECEIPT_BATCH_SIZE):
+                        chunk = hashes[i:i + RECEIPT_BATCH_SIZE]
+                        responses = await w3.provider.make_batch_request([
+                            ("eth_getTransactionReceipt", [tx_hash]) for tx_hash in chunk
+                        ])
+                        if not isinstance(responses, list):
+                            raise ValueError(f"batch request failed: {responses.get('error')}")
+
+                        for tx_hash, response in zip(chunk, responses):
+                            if response.get("result") and tx_hash in pending:
+                                # formatted receipt, only fetched once the transaction is mined
+                                receipt = await w3.eth.get_transaction_receipt(tx_hash)
+                                TransactionWatcher._resolve(pending.get(tx_hash, []), receipt)
+                    last_block = block
+                delay = POLL_INTERVAL
+            except Exception as e:
+                print(f"receipt watcher error on chain {chain_id}: {str(e)}")
+                delay = min(delay * 2, MAX_BACKOFF)
+
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    async def _watch_stakekit():
+        semaphore = asyncio.Semaphore(STATUS_CONCURRENCY)
+
+        async def check(tx_id: str, entry: _StakeKitEntry):
+            async with semaphore:
+                try:
+                    status_response = await entry.fetch_status()
+                    final = status_response.get("status") in FINAL_STAKEKIT_STATUSES
+                except Exception as e:
+                    # also an unexpected payload, only this transaction's waiters fail
+                    TransactionWatcher._resolve(entry.futures, error=e)
+                    return
+
+            if final:
+                TransactionWatcher._resolve(entry.futures, status_response)
+            else:
+                entry.interval = min(entry.interval * BACKOFF_FACTOR, MAX_BACKOFF)
+                entry.next_check = time.monotonic() + entry.interval
+
+        while TransactionWatcher._stakekit:
+            now = time.monotonic()
+            due = [(tx_id, entry) for tx_id, entry in TransactionWatcher._stakekit.items() if entry.next_check <= now]
+            await asyncio.gather(*[check(tx_id, entry) for tx_id, entry in due])
+            await asyncio.sleep(POLL_INTERVAL / 2)
+
+    @staticmethod
+    async def stop():
+        for task in TransactionWatcher._loops.values():
+            task.cancel()
+        await asyncio.gather(*TransactionWatcher._loops.values(), return_exceptions=True)
+        TransactionWatcher._loops.clear()
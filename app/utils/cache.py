@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+import asyncio
+import time
+
+class TTLCache:
+    """In-process cache with a per-entry TTL, an LRU size bound and hit/miss counters"""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        """Drop a single entry, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class AsyncLoadingCache:
+    """Read-through cache for async loaders.
+
+    Concurrent misses for a key share a single load (single-flight). Once an
+    entry is older than `ttl` it is still served for up to `stale_ttl` more
+    seconds while one background load refreshes it (stale-while-revalidate)."""
+
+    def __init__(self, ttl: float, stale_ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._loading: dict[Hashable, asyncio.Future] = {}
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            loaded_at, value = entry
+            if now - loaded_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            if now - loaded_at < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._start_load(key, load)
+                return value
+
+        self.misses += 1
+        return await asyncio.shield(self._start_load(key, load))
+
+    def _start_load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, load))
+            self._loading[key] = future
+            # background refreshes nobody awaits must not log "exception never retrieved"
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await load()
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+    def invalidate(self, key: Hashable = None):
+        """Drop a single entry, or every entry when no key is given"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "loading": len(self._loading)
+        }
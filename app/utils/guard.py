@@ -0,0 +1,154 @@
+from fastapi import HTTPException
+import httpx
+from dotenv import load_dotenv
+import asyncio
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+load_dotenv()
+
+# file shared by every worker process of this host, holds the token buckets and breaker states
+STATE_PATH = os.getenv("UPSTREAM_STATE_PATH", os.path.join(tempfile.gettempdir(), "aevia-upstreams.sqlite3"))
+# consecutive failures that open a circuit, and seconds it stays open before a probe request
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# seconds a call may queue for a rate limit token before failing
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "5"))
+
+_connection: sqlite3.Connection | None = None
+_connection_lock = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(STATE_PATH, timeout=5, isolation_level=None, check_same_thread=False)
+        _connection.execute("pragma journal_mode=wal")
+        _connection.execute("pragma synchronous=off")
+        _connection.execute("create table if not exists buckets (name text primary key, tokens real not null, updated real not null)")
+        _connection.execute(
+            "create table if not exists breakers ("
+            "name text primary key, state text not null default 'closed', "
+            "failures integer not null default 0, opened_at real not null default 0)"
+        )
+    return _connection
+
+class UpstreamUnavailable(HTTPException):
+    """An upstream call rejected locally because its circuit is open or its rate limit is exhausted"""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        super().__init__(
+            status_code=503,
+            detail=f"{upstream} unavailable: {reason}",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class UpstreamGuard:
+    """Token bucket rate limiter and circuit breaker for one upstream, shared by all workers of the host"""
+
+    def __init__(self, name: str, rate: float, burst: float | None = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst or rate * 2
+
+    def admit(self) -> float:
+        """Take a token, returning 0 when the call may proceed or the seconds until a token is available.
+        Raises UpstreamUnavailable while the circuit is open"""
+        now = time.time()
+        with _connection_lock:
+            db = _db()
+            db.execute("begin immediate")
+            try:
+                row = db.execute("select state, opened_at from breakers where name = ?", (self.name,)).fetchone()
+                probe = False
+                if row and row[0] != "closed":
+                    remaining = row[1] + CIRCUIT_RESET_TIMEOUT - now
+                    if remaining > 0:
+                        db.execute("commit")
+                        raise UpstreamUnavailable(self.name, "circuit open", remaining)
+                    probe = True
+
+                row = db.execute("select tokens, updated from buckets where name = ?", (self.name,)).fetchone()
+                tokens = min(self.burst, row[0] + (now - row[1]) * self.rate) if row else self.burst
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                if not wait:
+                    tokens -= 1
+                    if probe:
+                        # let a single probe through, everyone else keeps failing fast until it reports back
+                        db.execute("update breakers set state = 'half_open', opened_at = ? where name = ?", (now, self.name))
+                db.execute(
+                    "insert into buckets (name, tokens, updated) values (?, ?, ?) "
+                    "on conflict (name) do update set tokens = excluded.tokens, updated = excluded.updated",
+                    (self.name, tokens, now)
+                )
+                db.execute("commit")
+                return wait
+            except UpstreamUnavailable:
+                raise
+            except Exception:
+                db.execute("rollback")
+                raise
+
+    def record(self, ok: bool):
+        """Report the outcome of an admitted call to the circuit breaker"""
+        with _connection_lock:
+            db = _db()
+            if ok:
+                db.execute(
+                    "update breakers set state = 'closed', failures = 0 "
+                    "where name = ? and (state != 'closed' or failures > 0)",
+                    (self.name,)
+                )
+            else:
+                db.execute(
+                    "insert into breakers (name, failures) values (?, 1) "
+                    "on conflict (name) do update set failures = failures + 1, "
+                    "state = case when state = 'half_open' or failures + 1 >= ? then 'open' else state end, "
+                    "opened_at = case when state = 'half_open' or failures + 1 >= ? then ? else opened_at end",
+                    (self.name, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_FAILURE_THRESHOLD, time.time())
+                )
+
+    def acquire_sync(self):
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT
+        while wait := self.admit():
+            if time.monotonic() + wait > deadline:
+                raise UpstreamUnavailable(self.name, "rate limited", wait)
+            time.sleep(wait)
+
+    async def acquire(self):
+        """Wait for a rate limit token, queueing up to RATE_LIMIT_MAX_WAIT seconds"""
+        deadline = time.monotonic() + RATE_LIMIT_MAX_WAIT
+        while wait := await asyncio.to_thread(self.admit):
+            if time.monotonic() + wait > deadline:
+                raise UpstreamUnavailable(self.name, "rate limited", wait)
+            await asyncio.sleep(wait)
+
+    async def report(self, ok: bool):
+        await asyncio.to_thread(self.record, ok)
+
+def is_upstream_failure(status_code: int) -> bool:
+    """Responses that count against the breaker: throttling and server errors, not client errors"""
+    return status_code == 429 or status_code >= 500
+
+class GuardedTransport(httpx.AsyncBaseTransport):
+    """httpx transport that passes every request through an UpstreamGuard"""
+
+    def __init__(self, guard: UpstreamGuard, **kwargs):
+        self.guard = guard
+        self.transport = httpx.AsyncHTTPTransport(**kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.guard.acquire()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TransportError:
+            await self.guard.report(False)
+            raise
+        await self.guard.report(not is_upstream_failure(response.status_code))
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
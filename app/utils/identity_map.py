@@ -0,0 +1,49 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Hashable
+
+_rows: ContextVar[dict | None] = ContextVar("identity_map", default=None)
+
+class IdentityMap:
+    """Rows already loaded in the current unit of work (an API request or a job run), keyed by
+    (table, key), so services read each row from the database at most once per unit of work.
+    Outside a scope nothing is kept and every lookup misses"""
+
+    @staticmethod
+    @contextmanager
+    def scope():
+        token = _rows.set({})
+        try:
+            yield
+        finally:
+            _rows.reset(token)
+
+    @staticmethod
+    def get(table: str, key: Hashable) -> dict | None:
+        rows = _rows.get()
+        return rows.get((table, str(key))) if rows is not None else None
+
+    @staticmethod
+    def put(table: str, key: Hashable, row: dict | None):
+        rows = _rows.get()
+        if rows is not None and row is not None:
+            rows[(table, str(key))] = row
+
+    @staticmethod
+    def discard(table: str, key: Hashable):
+        rows = _rows.get()
+        if rows is not None:
+            rows.pop((table, str(key)), None)
+
+class IdentityMapMiddleware:
+    """ASGI middleware giving every HTTP request its own identity map scope"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with IdentityMap.scope():
+            await self.app(scope, receive, send)
@@ -0,0 +1,71 @@
+from typing import Any, AsyncIterator, Awaitable, Callable
+from dotenv import load_dotenv
+import base64
+import json
+import os
+
+load_dotenv()
+
+# rows per Supabase request when walking a whole table, keep at or below PostgREST's max-rows
+# or a capped page is taken for the last one
+PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+# ids per in.() filter, so the query string stays well below proxy URL limits
+IN_FILTER_SIZE = 100
+
+def encode_cursor(values: list[Any]) -> str:
+    """Opaque cursor for the keyset values of the last row of a page"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """Keyset values of a cursor made by encode_cursor for a keyset of `size` columns"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def after_filter(keys: tuple[str, ...], values: list[Any]) -> str:
+    """PostgREST or= filter for the rows after `values` in `keys` order"""
+    # double quoted so timestamps and names with reserved characters stay one value
+    quoted = [json.dumps(str(value)) for value in values]
+    clauses = []
+    for i, key in enumerate(keys):
+        conditions = [f"{keys[j]}.eq.{quoted[j]}" for j in range(i)] + [f"{key}.gt.{quoted[i]}"]
+        clauses.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return ",".join(clauses)
+
+async def iterate_batches(
+    fetch_page: Callable[[list[Any] | None, int], Awaitable[list[dict]]],
+    keys: tuple[str, ...],
+    page_size: int = PAGE_SIZE
+) -> AsyncIterator[list[dict]]:
+    """Yield every page of rows by following the keyset, holding a single page in memory"""
+    after = None
+    while True:
+        rows = await fetch_page(after, page_size)
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        after = [rows[-1][key] for key in keys]
+
+async def iterate_pages(
+    fetch_page: Callable[[list[Any] | None, int], Awaitable[list[dict]]],
+    keys: tuple[str, ...],
+    page_size: int = PAGE_SIZE
+) -> AsyncIterator[dict]:
+    """Yield every row by following the keyset, see iterate_batches"""
+    async for rows in iterate_batches(fetch_page, keys, page_size):
+        for row in rows:
+            yield row
+
+async def ndjson(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode rows as newline delimited JSON, one row per chunk"""
+    try:
+        async for row in rows:
+            yield (json.dumps(row, default=str) + "\n").encode()
+    except Exception as e:
+        # the status line is already sent, the truncated body is the only signal left
+        print(f"error streaming export: {str(e)}")
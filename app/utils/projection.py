@@ -0,0 +1,10 @@
+def select_columns(fields: list[str] | None, allowed: tuple[str, ...], default: tuple[str, ...] | None = None) -> str:
+    """PostgREST select list for the requested fields, `default` (or every allowed column) when none are given"""
+    if not fields:
+        return ",".join(default or allowed)
+
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}, expected any of {', '.join(allowed)}")
+    # keep the caller's order, without duplicates
+    return ",".join(dict.fromkeys(fields))
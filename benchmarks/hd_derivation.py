@@ -0,0 +1,51 @@
+"""
+CPU cost of deriving investment wallets by index.
+
+Compares the previous per-call `Account.from_mnemonic` derivation (PBKDF2
+seed stretch plus the full m/44'/60'/0'/0/{index} walk) with
+`WalletService.get_wallet_from_index`, which reuses the cached parent node.
+The "cold" run clears the account LRU so every index is a real child
+derivation, the "warm" run measures LRU hits.
+
+    python -m benchmarks.hd_derivation --count 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from eth_account import Account
+
+MNEMONIC = "test test test test test test test test test test test junk"
+
+def from_mnemonic(index: int):
+    return Account.from_mnemonic(MNEMONIC, account_path=f"m/44'/60'/0'/0/{index}")
+
+def timed(label: str, count: int, derive) -> list[str]:
+    start = time.perf_counter()
+    addresses = [derive(index).address for index in range(count)]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:>8.3f}s {elapsed / count * 1e6:>10.1f} us/index")
+    return addresses
+
+def main(args):
+    os.environ["WALLET_MNEMONIC_PHRASE"] = MNEMONIC
+    from app.services import wallet
+    from app.services.wallet import WalletService
+
+    Account.enable_unaudited_hdwallet_features()
+
+    before = timed("Account.from_mnemonic", args.count, from_mnemonic)
+    wallet._get_hd_parent.cache_clear()
+    wallet._derive_account.cache_clear()
+    cold = timed("cached parent (cold LRU)", args.count, WalletService.get_wallet_from_index)
+    warm = timed("cached parent (warm LRU)", args.count, WalletService.get_wallet_from_index)
+
+    assert before == cold == warm, "derived addresses differ"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    main(parser.parse_args())
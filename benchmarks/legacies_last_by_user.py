@@ -0,0 +1,70 @@
+"""
+Requests/sec for `GET /legacies/last/{user}` at increasing concurrency.
+
+By default the API talks to a PostgREST stand-in that answers after
+`--latency` seconds, so the numbers reflect how many DB round trips a single
+worker can keep in flight. Point `--postgrest-url` at a local PostgREST
+(backed by Postgres) to measure against the real thing.
+
+    python -m benchmarks.legacies_last_by_user --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks import postgrest_stub
+
+async def run_level(client, user: str, concurrency: int, total: int) -> float:
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(f"/legacies/last/{user}")
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return total / (time.perf_counter() - start)
+
+async def main(args):
+    if args.postgrest_url:
+        os.environ["SUPABASE_URL"] = args.postgrest_url
+        os.environ["SUPABASE_KEY"] = args.key
+    else:
+        postgrest_stub.start(args.port, args.latency)
+        os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{args.port}"
+        # the client only checks that the key looks like a JWT
+        os.environ["SUPABASE_KEY"] = "header.payload.signature"
+    # queue workers, balance refresh and pool filler would compete with the measured requests
+    os.environ["BACKGROUND_TASKS"] = "false"
+    os.environ.setdefault("STAKEKIT_API_KEY", "benchmark")
+    os.environ.setdefault("STAKEKIT_BASE_URL", "http://127.0.0.1:9")
+
+    import httpx
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://aevia") as client:
+            print(f"{'concurrency':>12} {'requests':>10} {'req/s':>10}")
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency * 5)
+                rps = await run_level(client, args.user, concurrency, total)
+                print(f"{concurrency:>12} {total:>10} {rps:>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.02, help="stand-in round trip latency in seconds")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--postgrest-url", help="use a running PostgREST instead of the stand-in")
+    parser.add_argument("--key", default="header.payload.signature", help="API key for --postgrest-url")
+    parser.add_argument("--user", default="benchmark-user")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""
+Minimal PostgREST stand-in for local benchmarks.
+
+Serves `/rest/v1/{table}` with a fixed row and `/rest/v1/rpc/{function}` with
+no rows after a configurable delay, which is enough to exercise the service
+layer without a real Supabase project.
+"""
+import asyncio
+import threading
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+
+LEGACY_ROW = {
+    "id": "6f1c1d2e-3b4a-4c5d-8e9f-0a1b2c3d4e5f",
+    "blockchain_id": "1",
+    "chain_id": 11155111,
+    "token_type": 0,
+    "token_address": "0x0000000000000000000000000000000000000001",
+    "token_id": None,
+    "amount": "1000000000000000000",
+    "wallet": "0x0000000000000000000000000000000000000002",
+    "heir_wallet": "0x0000000000000000000000000000000000000003",
+    "signature": None,
+    "name": "benchmark",
+    "telegram_id": "benchmark-user",
+    "telegram_id_emergency": "emergency",
+    "telegram_id_heir": "heir",
+    "contract_address": "0x0000000000000000000000000000000000000004",
+    "investment_enabled": False,
+    "created_at": "2025-01-01T00:00:00+00:00"
+}
+
+# scalar results of the functions that do not return rows, every other rpc returns no rows
+RPC_RESULTS = {
+    "lock_wallet_pool_fill": False,
+    "unlock_wallet_pool_fill": None,
+    "release_nonce": None
+}
+
+def create_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str):
+        await asyncio.sleep(latency)
+        return RPC_RESULTS.get(function, [])
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH"])
+    async def table(table: str, request: Request):
+        await asyncio.sleep(latency)
+        if table == "legacies":
+            return [LEGACY_ROW]
+        return []
+
+    return app
+
+def start(port: int, latency: float) -> uvicorn.Server:
+    """Start the stand-in in a background thread and wait until it accepts requests"""
+    server = uvicorn.Server(uvicorn.Config(create_app(latency), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
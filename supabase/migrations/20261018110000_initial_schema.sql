@@ -0,0 +1,47 @@
+-- Base tables as they existed before the versioned migrations, so a fresh database can be
+-- built from this folder alone. Columns added later live in their own migrations.
+create table if not exists public.contracts (
+    id bigint generated by default as identity primary key,
+    name text not null,
+    chain_id bigint not null,
+    address text not null,
+    abi jsonb not null default '[]'::jsonb,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists public.legacies (
+    id uuid primary key default gen_random_uuid(),
+    blockchain_id text,
+    chain_id bigint not null,
+    token_type smallint,
+    token_address text not null,
+    token_id text,
+    -- uint256 as a decimal string, the API never does arithmetic on it in SQL
+    amount text not null,
+    wallet text not null,
+    heir_wallet text not null,
+    signature text,
+    name text not null,
+    telegram_id text not null,
+    telegram_id_emergency text not null,
+    telegram_id_heir text not null,
+    contract_address text,
+    signal_confirmation_retries integer,
+    signal_requested_at timestamptz,
+    signal_received_at timestamptz,
+    investment_enabled boolean not null default false,
+    investment_risk smallint,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists public.investment_wallets (
+    id bigint generated by default as identity primary key,
+    -- HD index (m/44'/60'/0'/0/{index}), reserve_wallet_indexes draws from this sequence
+    index serial not null unique,
+    legacy_id uuid not null references public.legacies (id) on delete cascade,
+    address text not null,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz,
+    staked_at timestamptz,
+    unstaked_at timestamptz
+);
@@ -0,0 +1,6 @@
+-- Address -> HD index lookup for investment wallets (m/44'/60'/0'/0/{index})
+create table if not exists public.wallet_addresses (
+    index integer primary key check (index >= 0),
+    address text not null unique,
+    created_at timestamptz not null default now()
+);
@@ -0,0 +1,9 @@
+-- ERC-20 metadata never changes once deployed, keep it per (chain_id, token_address)
+create table if not exists public.token_metadata (
+    chain_id bigint not null,
+    token_address text not null,
+    symbol text not null,
+    decimals integer not null,
+    created_at timestamptz not null default now(),
+    primary key (chain_id, token_address)
+);
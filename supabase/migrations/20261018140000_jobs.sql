@@ -0,0 +1,20 @@
+-- Background operations on a legacy (on-chain execution for now), polled through GET /jobs/{id}
+create table if not exists public.jobs (
+    id uuid primary key default gen_random_uuid(),
+    legacy_id uuid not null references public.legacies (id) on delete cascade,
+    type text not null,
+    status text not null,
+    chain_id bigint,
+    tx_hash text,
+    result jsonb,
+    error text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists jobs_status_type_idx on public.jobs (status, type);
+
+-- receipt of the executeLegacy transaction
+alter table public.legacies
+    add column if not exists execution_tx_hash text,
+    add column if not exists executed_at timestamptz;
@@ -0,0 +1,35 @@
+-- Durable queue for StakeKit flows (stake, unstake, withdraw) on top of the jobs table
+alter table public.jobs
+    add column if not exists checkpoint jsonb not null default '{}'::jsonb,
+    add column if not exists attempts integer not null default 0,
+    add column if not exists locked_by text,
+    add column if not exists locked_at timestamptz;
+
+create index if not exists jobs_queue_idx on public.jobs (created_at) where status in ('queued', 'running');
+
+-- Atomically claims the oldest queued job of the given types, or a running one
+-- whose worker stopped renewing its lease, so any API worker can resume it.
+create or replace function public.claim_job(p_worker text, p_types text[], p_lease_seconds integer)
+returns setof public.jobs
+language sql
+as $$
+    update public.jobs
+    set status = 'running',
+        locked_by = p_worker,
+        locked_at = now(),
+        attempts = attempts + 1,
+        updated_at = now()
+    where id = (
+        select id
+        from public.jobs
+        where type = any (p_types)
+          and (
+              status = 'queued'
+              or (status = 'running' and locked_at < now() - make_interval(secs => p_lease_seconds))
+          )
+        order by created_at
+        for update skip locked
+        limit 1
+    )
+    returning *;
+$$;
@@ -0,0 +1,12 @@
+-- Last known StakeKit balances per investment legacy, refreshed in the background
+-- so portfolio reads are a single query instead of one StakeKit call per legacy
+create table if not exists public.balance_snapshots (
+    legacy_id uuid primary key references public.legacies (id) on delete cascade,
+    chain_id bigint not null,
+    integration_id text not null,
+    address text not null,
+    balances jsonb not null default '[]'::jsonb,
+    refreshed_at timestamptz not null default now()
+);
+
+create index if not exists balance_snapshots_refreshed_at_idx on public.balance_snapshots (refreshed_at);
@@ -0,0 +1,12 @@
+-- Idempotency-Key of the request that created a job, unique per legacy
+alter table public.jobs
+    add column if not exists idempotency_key text;
+
+create unique index if not exists jobs_legacy_idempotency_key_idx
+    on public.jobs (legacy_id, idempotency_key)
+    where idempotency_key is not null;
+
+-- at most one operation in flight per legacy, duplicates attach to it
+create unique index if not exists jobs_legacy_active_idx
+    on public.jobs (legacy_id)
+    where status in ('queued', 'running', 'submitted');
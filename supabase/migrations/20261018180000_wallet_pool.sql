@@ -0,0 +1,45 @@
+-- Pool of pre-derived investment wallet addresses: rows filled in the background are
+-- available until a legacy claims them, so creating a legacy derives no key
+alter table public.wallet_addresses
+    add column if not exists available boolean not null default false;
+
+create index if not exists wallet_addresses_available_idx on public.wallet_addresses (index) where available;
+
+-- Takes indexes from the investment_wallets sequence, so pooled and directly inserted
+-- investment wallets never share an index
+create or replace function public.reserve_wallet_indexes(p_count integer)
+returns setof bigint
+language sql
+as $$
+    select nextval(pg_get_serial_sequence('public.investment_wallets', 'index'))
+    from generate_series(1, p_count);
+$$;
+
+-- Atomically assigns one available pooled address to each legacy, in order. Returns fewer
+-- rows than legacies when the pool runs short, the caller allocates the rest directly.
+create or replace function public.claim_investment_wallets(p_legacy_ids uuid[])
+returns setof public.investment_wallets
+language sql
+as $$
+    with locked as (
+        select index, address
+        from public.wallet_addresses
+        where available
+        order by index
+        limit cardinality(p_legacy_ids)
+        for update skip locked
+    ), picked as (
+        select index, address, row_number() over (order by index) as n
+        from locked
+    ), taken as (
+        update public.wallet_addresses w
+        set available = false
+        from picked
+        where w.index = picked.index
+    )
+    insert into public.investment_wallets (legacy_id, index, address)
+    select l.legacy_id, picked.index, picked.address
+    from unnest(p_legacy_ids) with ordinality as l(legacy_id, n)
+    join picked on picked.n = l.n
+    returning *;
+$$;
@@ -0,0 +1,34 @@
+-- Indexes for the filters and orderings the repositories issue, checked with
+-- benchmarks/schema_queries.py
+
+-- GET /legacies/last/{user} (backward scan) and GET /legacies?user= (forward keyset)
+create index if not exists legacies_telegram_id_created_at_idx
+    on public.legacies (telegram_id, created_at, id);
+
+-- GET /legacies and /legacies/export keyset, optionally per chain
+create index if not exists legacies_created_at_idx on public.legacies (created_at, id);
+create index if not exists legacies_chain_id_created_at_idx on public.legacies (chain_id, created_at, id);
+
+-- balance refresh walks the investment legacies, signature verification the signed ones,
+-- both by the (created_at, id) keyset
+create index if not exists legacies_investment_enabled_idx
+    on public.legacies (created_at, id) where investment_enabled;
+create index if not exists legacies_signed_idx
+    on public.legacies (created_at, id) where signature is not null;
+
+-- one investment wallet per legacy, also the lookup index for get_by_legacy_id(s)
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint where conname = 'investment_wallets_legacy_id_key'
+    ) then
+        alter table public.investment_wallets
+            add constraint investment_wallets_legacy_id_key unique (legacy_id);
+    end if;
+end
+$$;
+
+-- get_contract_by_chain_and_name reads the latest registration of a (chain_id, name),
+-- registering a new version keeps the older rows
+create index if not exists contracts_chain_id_name_idx
+    on public.contracts (chain_id, name, created_at desc);
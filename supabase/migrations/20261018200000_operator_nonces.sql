@@ -0,0 +1,84 @@
+-- Next nonce of each sending account, shared by every API worker and host so two
+-- executions never sign with the same nonce
+create table if not exists public.operator_nonces (
+    chain_id bigint not null,
+    address text not null,
+    next_nonce bigint not null default 0,
+    -- set when a send failed, the next allocation resyncs from the node's pending count
+    stale boolean not null default true,
+    primary key (chain_id, address)
+);
+
+-- nonces handed out but not broadcast yet, skipped when resyncing
+create table if not exists public.operator_nonce_leases (
+    chain_id bigint not null,
+    address text not null,
+    nonce bigint not null,
+    leased_at timestamptz not null default now(),
+    primary key (chain_id, address, nonce)
+);
+
+-- Reserves the next nonce under the account row lock. Returns null when the account
+-- needs a resync and no p_pending was given, the caller fetches it and calls again.
+create or replace function public.allocate_nonce(
+    p_chain_id bigint, p_address text, p_pending bigint, p_lease_seconds integer
+)
+returns bigint
+language plpgsql
+as $$
+declare
+    v_next bigint;
+    v_stale boolean;
+begin
+    insert into public.operator_nonces (chain_id, address)
+    values (p_chain_id, p_address)
+    on conflict do nothing;
+
+    select next_nonce, stale into v_next, v_stale
+    from public.operator_nonces
+    where chain_id = p_chain_id and address = p_address
+    for update;
+
+    if v_stale then
+        if p_pending is null then
+            return null;
+        end if;
+        v_next := p_pending;
+    end if;
+
+    -- leases of workers that died before releasing them
+    delete from public.operator_nonce_leases
+    where chain_id = p_chain_id and address = p_address
+      and leased_at < now() - make_interval(secs => p_lease_seconds);
+
+    while exists (
+        select 1 from public.operator_nonce_leases
+        where chain_id = p_chain_id and address = p_address and nonce = v_next
+    ) loop
+        v_next := v_next + 1;
+    end loop;
+
+    insert into public.operator_nonce_leases (chain_id, address, nonce)
+    values (p_chain_id, p_address, v_next);
+
+    update public.operator_nonces
+    set next_nonce = v_next + 1, stale = false
+    where chain_id = p_chain_id and address = p_address;
+
+    return v_next;
+end
+$$;
+
+create or replace function public.release_nonce(
+    p_chain_id bigint, p_address text, p_nonce bigint, p_failed boolean
+)
+returns void
+language sql
+as $$
+    delete from public.operator_nonce_leases
+    where chain_id = p_chain_id and address = p_address and nonce = p_nonce;
+
+    update public.operator_nonces
+    set stale = true
+    where p_failed and chain_id = p_chain_id and address = p_address;
+$$;
@@ -0,0 +1,30 @@
+-- Every API worker runs the pool filler, a single-row lease lets one of them top the
+-- pool up at a time so they do not all reserve the same shortfall
+create table if not exists public.wallet_pool_fill (
+    id boolean primary key default true check (id),
+    locked_by text,
+    locked_until timestamptz not null default '-infinity'
+);
+
+insert into public.wallet_pool_fill default values on conflict do nothing;
+
+-- true when p_worker holds the lease, which expires after p_lease_seconds if never released
+create or replace function public.lock_wallet_pool_fill(p_worker text, p_lease_seconds integer)
+returns boolean
+language sql
+as $$
+    update public.wallet_pool_fill
+    set locked_by = p_worker,
+        locked_until = now() + make_interval(secs => p_lease_seconds)
+    where locked_until < now() or locked_by = p_worker
+    returning true;
+$$;
+
+create or replace function public.unlock_wallet_pool_fill(p_worker text)
+returns void
+language sql
+as $$
+    update public.wallet_pool_fill
+    set locked_by = null, locked_until = '-infinity'
+    where locked_by = p_worker;
+$$;